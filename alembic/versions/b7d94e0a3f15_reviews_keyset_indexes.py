@@ -0,0 +1,41 @@
+"""reviews keyset indexes
+
+Revision ID: b7d94e0a3f15
+Revises: 9e1f3b7c2d64
+Create Date: 2026-10-19 15:02:18.904213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d94e0a3f15'
+down_revision: Union[str, None] = '9e1f3b7c2d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Выражения должны совпадать с KEYSET_COLUMNS в api/Reviews/GetReviewsFullInfo.py
+    op.create_index(
+        'ix_reviews_keyset_published_at',
+        'reviews',
+        [sa.text("coalesce(published_at, '1970-01-01'::timestamptz)"), 'id'],
+        unique=False
+    )
+    op.create_index(
+        'ix_reviews_keyset_rating',
+        'reviews',
+        [sa.text('coalesce(rating, 0)'), 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_keyset_rating', table_name='reviews')
+    op.drop_index('ix_reviews_keyset_published_at', table_name='reviews')
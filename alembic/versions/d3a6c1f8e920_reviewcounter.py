@@ -0,0 +1,138 @@
+"""ReviewCounter
+
+Revision ID: d3a6c1f8e920
+Revises: b7d94e0a3f15
+Create Date: 2026-10-19 15:47:33.116580
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a6c1f8e920'
+down_revision: Union[str, None] = 'b7d94e0a3f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UPSERT = """
+    ON CONFLICT (client_id, status) DO UPDATE SET
+        reviews = review_counters.reviews + EXCLUDED.reviews,
+        with_response = review_counters.with_response + EXCLUDED.with_response
+"""
+
+# Триггеры уровня оператора с transition tables: массовый UPDATE ... RETURNING
+# из auto_send даёт одно агрегированное изменение счётчиков, а не по строке на отзыв
+REVIEWS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION review_counters_from_reviews() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO review_counters (client_id, status, reviews, with_response)
+        SELECT coalesce(n.client_id, ''), coalesce(n.status, ''), count(*), count(r.id)
+        FROM new_rows n LEFT JOIN neural_responses r ON r.review_id = n.id
+        GROUP BY 1, 2
+        {UPSERT};
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO review_counters (client_id, status, reviews, with_response)
+        SELECT coalesce(o.client_id, ''), coalesce(o.status, ''), -count(*), -count(r.id)
+        FROM old_rows o LEFT JOIN neural_responses r ON r.review_id = o.id
+        GROUP BY 1, 2
+        {UPSERT};
+    ELSE
+        INSERT INTO review_counters (client_id, status, reviews, with_response)
+        SELECT client_id, status, sum(d_reviews), sum(d_with_response)
+        FROM (
+            SELECT coalesce(o.client_id, '') AS client_id, coalesce(o.status, '') AS status,
+                   -1 AS d_reviews,
+                   -(EXISTS (SELECT 1 FROM neural_responses r WHERE r.review_id = o.id))::int AS d_with_response
+            FROM old_rows o
+            UNION ALL
+            SELECT coalesce(n.client_id, ''), coalesce(n.status, ''),
+                   1,
+                   (EXISTS (SELECT 1 FROM neural_responses r WHERE r.review_id = n.id))::int
+            FROM new_rows n
+        ) d
+        GROUP BY client_id, status
+        HAVING sum(d_reviews) <> 0 OR sum(d_with_response) <> 0
+        {UPSERT};
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+RESPONSES_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION review_counters_from_responses() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO review_counters (client_id, status, reviews, with_response)
+        SELECT coalesce(v.client_id, ''), coalesce(v.status, ''), 0, count(*)
+        FROM new_rows n JOIN reviews v ON v.id = n.review_id
+        GROUP BY 1, 2
+        {UPSERT};
+    ELSE
+        INSERT INTO review_counters (client_id, status, reviews, with_response)
+        SELECT coalesce(v.client_id, ''), coalesce(v.status, ''), 0, -count(*)
+        FROM old_rows o JOIN reviews v ON v.id = o.review_id
+        GROUP BY 1, 2
+        {UPSERT};
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS = [
+    ("review_counters_ins", "reviews", "INSERT", "NEW TABLE AS new_rows", "review_counters_from_reviews"),
+    ("review_counters_del", "reviews", "DELETE", "OLD TABLE AS old_rows", "review_counters_from_reviews"),
+    ("review_counters_upd", "reviews", "UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+     "review_counters_from_reviews"),
+    ("review_counters_resp_ins", "neural_responses", "INSERT", "NEW TABLE AS new_rows",
+     "review_counters_from_responses"),
+    ("review_counters_resp_del", "neural_responses", "DELETE", "OLD TABLE AS old_rows",
+     "review_counters_from_responses"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('review_counters',
+    sa.Column('client_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('reviews', sa.Integer(), nullable=False),
+    sa.Column('with_response', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('client_id', 'status')
+    )
+    # ### end Alembic commands ###
+
+    # Без записи в таблицы между начальным заполнением и созданием триггеров
+    op.execute("LOCK TABLE reviews, neural_responses IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        INSERT INTO review_counters (client_id, status, reviews, with_response)
+        SELECT coalesce(v.client_id, ''), coalesce(v.status, ''), count(*), count(r.id)
+        FROM reviews v LEFT JOIN neural_responses r ON r.review_id = v.id
+        GROUP BY 1, 2
+    """)
+    op.execute(REVIEWS_FUNCTION)
+    op.execute(RESPONSES_FUNCTION)
+    for name, table, event, referencing, function in TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER {name} AFTER {event} ON {table} "
+            f"REFERENCING {referencing} FOR EACH STATEMENT EXECUTE PROCEDURE {function}()"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, *_ in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS review_counters_from_responses()")
+    op.execute("DROP FUNCTION IF EXISTS review_counters_from_reviews()")
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('review_counters')
+    # ### end Alembic commands ###
@@ -3,12 +3,12 @@ import re
 from typing import Dict
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from src.models import ApiKeys
 from src.schemas.api_key import ApiKeyCreate, ApiKeyUpdate, ApiKeyResponse
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 
 router = APIRouter(
@@ -57,7 +57,7 @@ def convert_cookies_json_to_string(cookies_json: Dict[str, str]) -> str:
 )
 async def create_api_key_set(
         api_key_data: ApiKeyCreate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> ApiKeyResponse:
     try:
         # Валидация входных данных
@@ -76,8 +76,8 @@ async def create_api_key_set(
         )
 
         db.add(new_key_set)
-        db.commit()
-        db.refresh(new_key_set)
+        await db.commit()
+        await db.refresh(new_key_set)
 
         logger.info(f"Created new API key set: {api_key_id}")
         return new_key_set
@@ -85,13 +85,13 @@ async def create_api_key_set(
     except HTTPException:
         raise
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="API key set already exists"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating API keys: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,9 +1,9 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models import ApiKeys
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 
 router = APIRouter(
@@ -18,22 +18,22 @@ router = APIRouter(
 )
 async def delete_api_key(
     key_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        key_set = db.query(ApiKeys).filter(ApiKeys.id == key_id).first()
+        key_set = await db.get(ApiKeys, key_id)
         if not key_set:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="API key set not found"
             )
 
-        db.delete(key_set)
-        db.commit()
+        await db.delete(key_set)
+        await db.commit()
         logger.info(f"Deleted API key set: {key_id}")
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting API keys: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,11 +1,13 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from src.models import ApiKeys
 from src.schemas.api_key import ApiKeyCreate, ApiKeyUpdate, ApiKeyResponse
-from src.database import get_db
+from src.database import get_async_db
+from src.api.http_cache import resource_etag, etag_matches, etag_headers, not_modified
 from src.api.logger import logger
 
 router = APIRouter(
@@ -19,10 +21,17 @@ router = APIRouter(
     summary="Get all API key sets"
 )
 async def get_all_api_keys(
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ) -> list[ApiKeyResponse]:
     try:
-        keys = db.query(ApiKeys).all()
+        etag = await resource_etag(db, ("api_keys",))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update(etag_headers(etag))
+
+        keys = (await db.execute(select(ApiKeys))).scalars().all()
         return keys
     except Exception as e:
         logger.error(f"Error fetching API keys: {str(e)}")
@@ -2,12 +2,12 @@ import uuid
 from typing import Dict
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from src.models import ApiKeys
 from src.schemas.api_key import ApiKeyCreate, ApiKeyUpdate, ApiKeyResponse
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 
 router = APIRouter(
@@ -36,10 +36,10 @@ def convert_cookies_json_to_string(cookies_json: Dict[str, str]) -> str:
 async def update_api_key(
         key_id: str,
         api_key_data: ApiKeyUpdate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> ApiKeyResponse:
     try:
-        key_set = db.query(ApiKeys).filter(ApiKeys.id == key_id).first()
+        key_set = await db.get(ApiKeys, key_id)
         if not key_set:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -55,14 +55,14 @@ async def update_api_key(
         for field, value in update_data.items():
             setattr(key_set, field, value)
 
-        db.commit()
-        db.refresh(key_set)
+        await db.commit()
+        await db.refresh(key_set)
 
         logger.info(f"Updated API key set: {key_id}")
         return key_set
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error updating API keys: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db
 from src.models import PredefinedResponse
 from src.schemas.predefined_response import PredefinedResponseInDB, PredefinedResponseList
 
@@ -11,11 +12,13 @@ router = APIRouter(prefix="/predefined_response",)
 async def get_all_predefined_responses(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        items = db.query(PredefinedResponse).offset(skip).limit(limit).all()
-        total = db.query(PredefinedResponse).count()
+        items = (await db.execute(
+            select(PredefinedResponse).order_by(PredefinedResponse.id).offset(skip).limit(limit)
+        )).scalars().all()
+        total = await db.scalar(select(func.count()).select_from(PredefinedResponse))
         return {"items": items, "total": total}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -24,9 +27,9 @@ async def get_all_predefined_responses(
 @router.get("/{response_id}", response_model=PredefinedResponseInDB, tags=["Заготовленные ответы"])
 async def get_predefined_response(
     response_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    response = db.query(PredefinedResponse).get(response_id)
+    response = await db.get(PredefinedResponse, response_id)
     if not response:
         raise HTTPException(status_code=404, detail="Response not found")
-    return response
\ No newline at end of file
+    return response
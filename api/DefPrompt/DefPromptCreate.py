@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db
 from src.models import PredefinedResponse
 from src.schemas.predefined_response import PredefinedResponseCreate, PredefinedResponseInDB
 
@@ -10,14 +10,14 @@ router = APIRouter(prefix="/predefined_response")
 @router.post("/create", response_model=PredefinedResponseInDB, tags=["Заготовленные ответы"])
 async def create_predefined_response(
     response_data: PredefinedResponseCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         db_response = PredefinedResponse(**response_data.model_dump())
         db.add(db_response)
-        db.commit()
-        db.refresh(db_response)
+        await db.commit()
+        await db.refresh(db_response)
         return db_response
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
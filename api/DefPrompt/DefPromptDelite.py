@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db
 from src.models import PredefinedResponse
 
 router = APIRouter(prefix="/predefined_response")
@@ -9,16 +9,16 @@ router = APIRouter(prefix="/predefined_response")
 @router.delete("/{response_id}", tags=["Заготовленные ответы"])
 async def delete_predefined_response(
     response_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        response = db.query(PredefinedResponse).get(response_id)
+        response = await db.get(PredefinedResponse, response_id)
         if not response:
             raise HTTPException(status_code=404, detail="Response not found")
 
-        db.delete(response)
-        db.commit()
+        await db.delete(response)
+        await db.commit()
         return {"message": "Response deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
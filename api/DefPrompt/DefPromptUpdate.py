@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db
 from src.models import PredefinedResponse
 from src.schemas.predefined_response import PredefinedResponseUpdate, PredefinedResponseInDB
 
@@ -11,10 +11,10 @@ router = APIRouter(prefix="/predefined_response")
 async def update_predefined_response(
     response_id: int,
     update_data: PredefinedResponseUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        response = db.query(PredefinedResponse).get(response_id)
+        response = await db.get(PredefinedResponse, response_id)
         if not response:
             raise HTTPException(status_code=404, detail="Response not found")
 
@@ -22,9 +22,9 @@ async def update_predefined_response(
         for field, value in update_dict.items():
             setattr(response, field, value)
 
-        db.commit()
-        db.refresh(response)
+        await db.commit()
+        await db.refresh(response)
         return response
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
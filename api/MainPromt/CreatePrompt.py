@@ -1,12 +1,13 @@
 import uuid
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models import Prompt  # Импортируем модель
 from src.schemas.Prompt import PromptModel
 from src.schemas.PromptCreate import PromptCreateModel
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 
 router = APIRouter()
@@ -15,14 +16,14 @@ router = APIRouter()
 @router.post("/prompts", response_model=PromptModel, tags=["Общий промт"])
 async def create_prompt(
         request: PromptCreateModel,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """Создать новый промт"""
     try:
         # Если новый промт активный, деактивируем другие
         if request.is_active:
-            db.query(Prompt).update({"is_active": False})
-            db.commit()
+            await db.execute(update(Prompt).values(is_active=False))
+            await db.commit()
 
         # Создаем новый промт
         prompt = Prompt(
@@ -32,8 +33,8 @@ async def create_prompt(
         )
 
         db.add(prompt)
-        db.commit()
-        db.refresh(prompt)
+        await db.commit()
+        await db.refresh(prompt)
 
         # Возвращаем созданный промт
         return {
@@ -44,6 +45,6 @@ async def create_prompt(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating prompt: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
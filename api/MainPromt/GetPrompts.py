@@ -1,23 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.database import get_async_db
 from src.models import Prompt  # Импортируем модель
 from src.schemas.Prompt import PromptModel
+from src.api.http_cache import resource_etag, etag_matches, etag_headers, not_modified
 from src.api.logger import logger
 
 router = APIRouter()
 
 
 @router.get("/prompts", response_model=list[PromptModel], tags=["Общий промт"])
-async def get_prompts(db: Session = Depends(get_db)):
+async def get_prompts(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Получить все промты (сортировка: активные сначала)"""
     try:
-        prompts = db.query(Prompt).order_by(
-            desc(Prompt.is_active),  # Сначала активные
-            desc(Prompt.created_at)  # Потом новые
-        ).all()
+        etag = await resource_etag(db, ("prompts",))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update(etag_headers(etag))
+
+        prompts = (await db.execute(
+            select(Prompt).order_by(
+                desc(Prompt.is_active),  # Сначала активные
+                desc(Prompt.created_at)  # Потом новые
+            )
+        )).scalars().all()
 
         return [
             {
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models import Prompt
-from src.database import get_db
+from src.database import get_async_db
 from src.schemas.Prompt import PromptModel
 from src.schemas.PromptUpdate import PromptUpdateModel
 from src.api.logger import logger
@@ -13,18 +14,18 @@ router = APIRouter()
 async def update_prompt(
     prompt_id: str,
     request: PromptUpdateModel,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update prompt"""
     try:
         # Get the prompt or return 404
-        prompt = db.query(Prompt).filter_by(id=prompt_id).first()
+        prompt = (await db.execute(select(Prompt).filter_by(id=prompt_id))).scalars().first()
         if not prompt:
             raise HTTPException(status_code=404, detail="Prompt not found")
 
         # If activating this prompt, deactivate others
         if request.is_active is True:
-            db.query(Prompt).filter(Prompt.is_active == True).update({"is_active": False})
+            await db.execute(update(Prompt).where(Prompt.is_active == True).values(is_active=False))
 
         # Update fields if they're provided in request
         if request.content is not None:
@@ -32,8 +33,8 @@ async def update_prompt(
         if request.is_active is not None:
             prompt.is_active = request.is_active
 
-        db.commit()
-        db.refresh(prompt)  # Refresh to get updated values from DB
+        await db.commit()
+        await db.refresh(prompt)  # Refresh to get updated values from DB
 
         return {
             "id": prompt.id,
@@ -45,6 +46,6 @@ async def update_prompt(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error updating prompt {prompt_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from src.models import ProductPrompt, ProductInfo
-from src.database import get_db
+from src.database import get_async_db
 from src.schemas.ProductPromptResponse import ProductPromptResponseModel
 
 router = APIRouter()
@@ -14,29 +15,31 @@ router = APIRouter()
 async def list_product_prompts(
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Подзапрос для product_name
-        product_name_subquery = db.query(
+        product_name_subquery = select(
             ProductInfo.sku,
             func.max(ProductInfo.product_name).label('product_name')
         ).group_by(ProductInfo.sku).subquery()
 
         # Основной запрос
-        prompts = db.query(
-            ProductPrompt.sku,
-            ProductPrompt.prompt,
-            product_name_subquery.c.product_name,
-            ProductPrompt.updated_at
-        ).outerjoin(
-            product_name_subquery,
-            ProductPrompt.sku == product_name_subquery.c.sku
-        ).order_by(
-            desc(ProductPrompt.updated_at)
-        ).offset(skip).limit(limit).all()
-
-        # Преобразуем в формат для Pydantic
+        prompts = (await db.execute(
+            select(
+                ProductPrompt.sku,
+                ProductPrompt.prompt,
+                product_name_subquery.c.product_name,
+                ProductPrompt.updated_at
+            ).outerjoin(
+                product_name_subquery,
+                ProductPrompt.sku == product_name_subquery.c.sku
+            ).order_by(
+                desc(ProductPrompt.updated_at)
+            ).offset(skip).limit(limit)
+        )).all()
+
+        # Формат ProductPromptResponseModel; схема только документирует ответ, валидации нет
         result = []
         for p in prompts:
             # Конвертируем updated_at в datetime, если нужно
@@ -54,7 +57,7 @@ async def list_product_prompts(
                 "updated_at": updated_at
             })
 
-        return result
+        return ORJSONResponse(result)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
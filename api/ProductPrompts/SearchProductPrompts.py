@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models import ProductPrompt, ProductInfo
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 from src.schemas.ProductPromptResponse import ProductPromptResponseModel
 
@@ -12,34 +12,41 @@ router = APIRouter()
 @router.get("/product_prompts/search", response_model=ProductPromptResponseModel, tags=["Промты товаров"])
 async def search_product_prompts(
     sku: str = Query(..., description="SKU товара для поиска"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Поиск промтов товаров по SKU (точное совпадение)
     """
     try:
+        # asyncpg не приводит строку к integer сам, нечисловой SKU заведомо не найдётся
+        sku_value = int(sku) if sku.strip().isdigit() else None
+
         # Создаем подзапрос для получения product_name
-        product_name_subquery = db.query(
+        product_name_subquery = select(
             ProductInfo.sku,
             func.max(ProductInfo.product_name).label('product_name')
         ).filter(
-            ProductInfo.sku == sku
+            ProductInfo.sku == sku_value
         ).group_by(
             ProductInfo.sku
         ).subquery()
 
         # Основной запрос
-        prompt = db.query(
-            ProductPrompt.sku,
-            ProductPrompt.prompt,
-            product_name_subquery.c.product_name,
-            ProductPrompt.updated_at
-        ).outerjoin(
-            product_name_subquery,
-            ProductPrompt.sku == product_name_subquery.c.sku
-        ).filter(
-            ProductPrompt.sku == sku
-        ).first()
+        prompt = None
+        if sku_value is not None:
+            prompt = (await db.execute(
+                select(
+                    ProductPrompt.sku,
+                    ProductPrompt.prompt,
+                    product_name_subquery.c.product_name,
+                    ProductPrompt.updated_at
+                ).outerjoin(
+                    product_name_subquery,
+                    ProductPrompt.sku == product_name_subquery.c.sku
+                ).filter(
+                    ProductPrompt.sku == sku_value
+                )
+            )).first()
 
         if not prompt:
             raise HTTPException(
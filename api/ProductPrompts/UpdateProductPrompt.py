@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.postgresql import insert
 
 from src.models import ProductPrompt, ProductInfo
-from src.database import get_db
+from src.database import get_async_db
 
 router = APIRouter()
 
@@ -11,11 +12,11 @@ router = APIRouter()
 async def update_product_prompt(
     sku: int = Form(...),
     prompt: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Проверяем существование SKU
-        if not db.query(ProductInfo.sku).filter_by(sku=sku).first():
+        if not (await db.execute(select(ProductInfo.sku).filter_by(sku=sku).limit(1))).first():
             raise HTTPException(status_code=404, detail="SKU не найден")
 
         # Создаем или обновляем промпт
@@ -27,8 +28,8 @@ async def update_product_prompt(
             set_={'prompt': prompt}
         )
 
-        db.execute(stmt)
-        db.commit()
+        await db.execute(stmt)
+        await db.commit()
 
         return {
             "message": "Промпт обновлен",
@@ -40,7 +41,7 @@ async def update_product_prompt(
         raise  # Пробрасываем HTTPException как есть
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Ошибка при обновлении промпта: {str(e)}"
@@ -1,12 +1,14 @@
 import uuid
 import re
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from src.models import ReviewFilter
 from src.schemas.review_filter import ReviewFilterCreate, ReviewFilterUpdate, ReviewFilterResponse
-from src.database import get_db
+from src.database import get_async_db
+from src.api.http_cache import resource_etag, etag_matches, etag_headers, not_modified
 from src.api.logger import logger
 
 router = APIRouter(
@@ -41,10 +43,17 @@ def validate_input_data(data):
     summary="Get all review filters"
 )
 async def get_all_review_filters(
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ) -> list[ReviewFilterResponse]:
     try:
-        filters = db.query(ReviewFilter).all()
+        etag = await resource_etag(db, ("review_filters",))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update(etag_headers(etag))
+
+        filters = (await db.execute(select(ReviewFilter))).scalars().all()
         return filters
     except Exception as e:
         logger.error(f"Error fetching review filters: {str(e)}")
@@ -1,12 +1,12 @@
 import uuid
 import re
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from src.models import ReviewFilter
 from src.schemas.review_filter import ReviewFilterCreate, ReviewFilterUpdate, ReviewFilterResponse
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 
 router = APIRouter(
@@ -43,14 +43,14 @@ def validate_input_data(data):
 async def update_review_filter(
     filter_id: str,
     filter_data: ReviewFilterUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ReviewFilterResponse:
     try:
         # Валидация входных данных
         validate_input_data(filter_data)
 
         # Получаем фильтр из базы данных
-        db_filter = db.query(ReviewFilter).filter(ReviewFilter.id == filter_id).first()
+        db_filter = await db.get(ReviewFilter, filter_id)
         if not db_filter:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -62,8 +62,8 @@ async def update_review_filter(
         for field, value in update_data.items():
             setattr(db_filter, field, value)
 
-        db.commit()
-        db.refresh(db_filter)
+        await db.commit()
+        await db.refresh(db_filter)
 
         logger.info(f"Updated review filter: {filter_id}")
         return db_filter
@@ -71,7 +71,7 @@ async def update_review_filter(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error updating review filter: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,12 +1,12 @@
 import uuid
 import re
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from src.models import ReviewFilter
 from src.schemas.review_filter import ReviewFilterCreate, ReviewFilterUpdate, ReviewFilterResponse
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 
 router = APIRouter(
@@ -42,11 +42,11 @@ def validate_input_data(data):
 async def delete_review_filter(
     filter_id: str,
     hard_delete: bool = False,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Получаем фильтр из базы данных
-        db_filter = db.query(ReviewFilter).filter(ReviewFilter.id == filter_id).first()
+        db_filter = await db.get(ReviewFilter, filter_id)
         if not db_filter:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -55,19 +55,19 @@ async def delete_review_filter(
 
         if hard_delete:
             # Полное удаление из базы данных
-            db.delete(db_filter)
+            await db.delete(db_filter)
             logger.info(f"Hard deleted review filter: {filter_id}")
         else:
             # Мягкое удаление (установка IS_ACTIVE=False)
             db_filter.IS_ACTIVE = False
             logger.info(f"Soft deleted review filter: {filter_id}")
 
-        db.commit()
+        await db.commit()
 
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting review filter: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
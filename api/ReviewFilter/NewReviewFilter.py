@@ -1,12 +1,12 @@
 import uuid
 import re
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from src.models import ReviewFilter
 from src.schemas.review_filter import ReviewFilterCreate, ReviewFilterUpdate, ReviewFilterResponse
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
 
 router = APIRouter(
@@ -42,7 +42,7 @@ def validate_input_data(data):
 )
 async def create_review_filter(
     filter_data: ReviewFilterCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ReviewFilterResponse:
     try:
         # Валидация входных данных
@@ -56,8 +56,8 @@ async def create_review_filter(
         )
 
         db.add(new_filter)
-        db.commit()
-        db.refresh(new_filter)
+        await db.commit()
+        await db.refresh(new_filter)
 
         logger.info(f"Created new review filter: {filter_id}")
         return new_filter
@@ -65,13 +65,13 @@ async def create_review_filter(
     except HTTPException:
         raise
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Review filter with this ID already exists"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating review filter: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterable, Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, text
+
+from src.models import Review, ProductInfo, NeuralResponse
+from src.database import async_session
+from src.api.Reviews.ProductReport import parse_report_date
+from src.api.logger import logger
+
+router = APIRouter()
+
+# Строк на одну выборку серверного курсора и на один отправляемый клиенту кусок
+EXPORT_BATCH_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    "review_id", "client_id", "sku", "product_name", "review_text", "rating",
+    "status", "published_at", "response_text", "response_created_at",
+]
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def format_csv(rows: Iterable, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([export_value(v) for v in row] for row in rows)
+    return buffer.getvalue()
+
+
+def format_ndjson(rows: Iterable, header: bool) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, map(export_value, row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+@router.get("/reviews/export", tags=["Отзывы"])
+async def export_reviews(
+    ozon_client_id: str = Query(..., description="Клиент, отзывы которого выгружаются"),
+    start_date: Optional[str] = Query(None, description="Начальная дата публикации в формате YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Конечная дата публикации в формате YYYY-MM-DD"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv или ndjson"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip"),
+):
+    """
+    Потоковая выгрузка отзывов клиента с товаром и ответом нейросети (CSV или NDJSON).
+
+    Строки читаются серверным курсором пачками по EXPORT_BATCH_SIZE и сразу
+    отдаются клиенту, поэтому память не зависит от размера выгрузки.
+    """
+    start_day = parse_report_date(start_date, "start_date")
+    end_day = parse_report_date(end_date, "end_date")
+
+    query = (
+        select(
+            Review.id,
+            Review.client_id,
+            Review.sku,
+            ProductInfo.product_name,
+            Review.text,
+            Review.rating,
+            Review.status,
+            Review.published_at,
+            NeuralResponse.response_text,
+            NeuralResponse.created_at
+        )
+        .outerjoin(ProductInfo, Review.id == ProductInfo.review_id)
+        .outerjoin(NeuralResponse, Review.id == NeuralResponse.review_id)
+        .where(Review.client_id == ozon_client_id)
+        .order_by(Review.published_at, Review.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if start_day:
+        query = query.where(Review.published_at >= start_day)
+    if end_day:
+        query = query.where(Review.published_at < end_day + timedelta(days=1))
+
+    format_rows = format_csv if format == "csv" else format_ndjson
+
+    async def export_stream() -> AsyncIterator[bytes]:
+        # gzip-поток: wbits=31 пишет заголовок и контрольную сумму gzip
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+        exported = 0
+        try:
+            async with async_session() as db:
+                # Выгрузка миллионов строк дольше обычного лимита на запрос
+                await db.execute(text("SET LOCAL statement_timeout = 0"))
+                result = await db.stream(query)
+                async for rows in result.partitions():
+                    chunk = format_rows(rows, header=exported == 0).encode("utf-8")
+                    exported += len(rows)
+                    yield compressor.compress(chunk) if compressor else chunk
+                if exported == 0 and format == "csv":
+                    chunk = format_rows([], header=True).encode("utf-8")
+                    yield compressor.compress(chunk) if compressor else chunk
+            if compressor:
+                yield compressor.flush()
+            logger.info(f"Export for client {ozon_client_id}: {exported} rows")
+        except Exception as e:
+            # Заголовки уже отправлены - обрываем поток, клиент получит неполный файл
+            logger.error(f"Error exporting reviews for client {ozon_client_id}: {str(e)}", exc_info=True)
+            raise
+
+    filename = f"reviews_{ozon_client_id}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_stream(),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,120 +1,243 @@
+import base64
+import json
 import traceback
 from datetime import datetime
-from typing import List
+from typing import Any, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, asc, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import desc, asc, func, select, tuple_, literal, literal_column, DateTime, Integer, String
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.models import Review, ProductInfo, NeuralResponse, Photo, Video
+from src.models import Review, ProductInfo, NeuralResponse, Photo, Video, ReviewCounter
 from src.schemas.PaginatedResponse import PaginatedResponseModel
-from src.database import get_db
+from src.database import get_async_db
+from src.api.http_cache import (
+    ResponseCache, resource_etag, etag_matches, not_modified, render_json, json_response, request_cache_key
+)
 from src.api.logger import logger
 
 
 router = APIRouter()
 
+# Ресурсы resource_versions, от которых зависит страница
+REVIEW_RESOURCES = ("reviews",)
+
+response_cache = ResponseCache()
+
+# Ключи keyset-пагинации: NULL заменяется константой, чтобы сравнение (ключ, id)
+# было полным порядком. Ключи published_at и rating совпадают с индексами
+# ix_reviews_keyset_*; product_name сортируется через join с product_info без
+# индекса, поэтому такая сортировка по-прежнему читает и сортирует всю выборку
+KEYSET_COLUMNS = {
+    "published_at": (
+        func.coalesce(Review.published_at, literal_column("'1970-01-01'::timestamptz")),
+        DateTime(timezone=True)
+    ),
+    "rating": (func.coalesce(Review.rating, literal_column("0")), Integer()),
+    "product_name": (func.coalesce(ProductInfo.product_name, literal_column("''")), String()),
+}
+
+
+def encode_cursor(sort_by: str, sort_dir: str, value: Any, review_id: str) -> str:
+    """Непрозрачный курсор: base64 от JSON с ключом сортировки последней строки страницы"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"s": sort_by, "d": sort_dir, "v": value, "id": review_id}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_dir: str) -> Tuple[Any, str]:
+    """Возвращает (значение ключа, id) из курсора; курсор должен быть выдан для той же сортировки"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload["s"] != sort_by or payload["d"] != sort_dir:
+            raise ValueError("cursor was issued for another sort order")
+        value = payload["v"]
+        if sort_by == "published_at":
+            value = datetime.fromisoformat(value)
+        return value, str(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Неверный cursor: {e}")
+
+
 @router.get("/reviews/full_info", response_model=PaginatedResponseModel, tags=["Отзывы"])
 async def get_full_reviews_info(
+    request: Request,
     limit: int = Query(10, gt=0, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Устаревшая пагинация, игнорируется при переданном cursor"),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    include_total: Optional[bool] = Query(
+        None, description="Считать total (по умолчанию только на первой странице)"
+    ),
     sort_by: str = Query("published_at"),
     sort_dir: str = Query("desc"),
     ozon_client_id: str = Query(None),
-    sku: str = Query(None, description="Фильтр по SKU товара"),  # Добавлен новый параметр
+    sku: int = Query(None, description="Фильтр по SKU товара"),  # Добавлен новый параметр
     status: List[str] = Query(["UNPROCESSED"], description="Фильтр по статусам отзывов"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    """
+    Отзывы с товаром, ответом нейросети, фото и видео.
+
+    Страницы листаются по курсору: next_cursor из ответа передаётся в cursor
+    следующего запроса, и страница выбирается условием (ключ сортировки, id) <
+    курсора вместо OFFSET, поэтому глубина прокрутки не влияет на время ответа.
+    total считается только на первой странице или по include_total=true.
+
+    Ответ помечается ETag по версии отзывов: если данные не менялись,
+    If-None-Match получает 304 без запросов к отзывам, а одинаковые
+    запросы за RESPONSE_CACHE_TTL отдаются из кэша процесса.
+    """
+    etag = await resource_etag(db, REVIEW_RESOURCES)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    async def build() -> bytes:
+        return render_json(await build_full_reviews_info(
+            db, limit, offset, cursor, include_total, sort_by, sort_dir, ozon_client_id, sku, status
+        ))
+
+    body = await response_cache.get_or_build(request_cache_key(request, etag), build)
+    return json_response(body, etag)
+
+
+async def build_full_reviews_info(
+    db: AsyncSession,
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+    include_total: Optional[bool],
+    sort_by: str,
+    sort_dir: str,
+    ozon_client_id: Optional[str],
+    sku: Optional[int],
+    status: List[str],
+) -> dict:
+    """Страница /reviews/full_info из строк БД (без валидации по response_model)"""
     try:
         # Валидация параметров сортировки
-        sort_fields = {
-            "published_at": Review.published_at,
-            "rating": Review.rating,
-            "product_name": ProductInfo.product_name
-        }
-
-        if sort_by not in sort_fields:
+        if sort_by not in KEYSET_COLUMNS:
             sort_by = "published_at"
+        sort_dir = "desc" if sort_dir.lower() == "desc" else "asc"
 
-        sort_column = sort_fields[sort_by]
-        sort_method = desc if sort_dir.lower() == "desc" else asc
+        sort_column, sort_type = KEYSET_COLUMNS[sort_by]
+        sort_method = desc if sort_dir == "desc" else asc
 
-        # Запрос для получения общего количества отзывов по статусам
-        status_counts_query = db.query(
-            Review.status,
-            func.count(Review.id).label("count")
-        ).group_by(Review.status)
+        # Счётчики по статусам и ответам ведутся триггерами в review_counters,
+        # поэтому дашборд не пересчитывает всю таблицу reviews на каждый запрос
+        counters_query = select(
+            ReviewCounter.status,
+            func.sum(ReviewCounter.reviews).label("reviews"),
+            func.sum(ReviewCounter.with_response).label("with_response")
+        ).group_by(ReviewCounter.status)
+
+        if ozon_client_id:
+            counters_query = counters_query.filter(ReviewCounter.client_id == ozon_client_id)
 
-        # Запрос для подсчета отзывов с ответами и без
-        response_stats_query = db.query(
-            func.count(Review.id).label("total"),
-            func.count(NeuralResponse.id).label("with_response"),
-            (func.count(Review.id) - func.count(NeuralResponse.id)).label("without_response")
-        ).outerjoin(NeuralResponse, Review.id == NeuralResponse.review_id)
+        counters = (await db.execute(counters_query)).all()
+        status_counts = {row.status or None: int(row.reviews) for row in counters if row.reviews}
+        total_reviews = sum(int(row.reviews) for row in counters)
+        with_response = sum(int(row.with_response) for row in counters)
 
+        # Условия выборки; total считается по ним без JOIN'ов
+        conditions = [Review.status.in_(status)]
         if ozon_client_id:
-            status_counts_query = status_counts_query.filter(Review.client_id == ozon_client_id)
-            response_stats_query = response_stats_query.filter(Review.client_id == ozon_client_id)
-
-        status_counts = {row.status: row.count for row in status_counts_query.all()}
-        response_stats = response_stats_query.first()
-
-        # Основной запрос с подгрузкой всех связанных данных
-        query = db.query(Review).options(
-            joinedload(Review.product_info),
-            joinedload(Review.neural_response),
-            joinedload(Review.photos),
-            joinedload(Review.videos)
-        ).filter(
-            Review.status.in_(status)
+            conditions.append(Review.client_id == ozon_client_id)
+        if sku:
+            conditions.append(Review.sku == sku)
+
+        if include_total is None:
+            include_total = cursor is None
+        total = None
+        if include_total:
+            total = await db.scalar(select(func.count(Review.id)).where(*conditions))
+
+        # Страница - только скалярные колонки: product_info и neural_response у отзыва
+        # не более одной строки, поэтому их JOIN не размножает строки и LIMIT остаётся точным
+        query = (
+            select(
+                Review.id,
+                Review.client_id,
+                Review.sku,
+                Review.text,
+                Review.rating,
+                Review.published_at,
+                Review.status,
+                ProductInfo.review_id.label("product_info_id"),
+                ProductInfo.product_name,
+                NeuralResponse.id.label("response_id"),
+                NeuralResponse.response_text,
+                NeuralResponse.created_at.label("response_created_at"),
+                sort_column.label("sort_key")
+            )
+            .outerjoin(ProductInfo, Review.id == ProductInfo.review_id)
+            .outerjoin(NeuralResponse, Review.id == NeuralResponse.review_id)
+            .where(*conditions)
         )
 
-        # Добавляем фильтр по client_id, если он указан
-        if ozon_client_id:
-            query = query.filter(Review.client_id == ozon_client_id)
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort_by, sort_dir)
+            key = tuple_(sort_column, Review.id)
+            bound = tuple_(literal(value, sort_type), literal(last_id, String()))
+            query = query.filter(key < bound if sort_dir == "desc" else key > bound)
+        elif offset:
+            query = query.offset(offset)
 
-        # Если сортировка по product_name, добавляем JOIN
-        if sort_by == "product_name":
-            query = query.join(ProductInfo, Review.sku == ProductInfo.sku)
+        # Лишняя строка показывает, есть ли следующая страница
+        query = query.order_by(sort_method(sort_column), sort_method(Review.id))
+        rows = (await db.execute(query.limit(limit + 1))).all()
 
-        if sku:
-            query = query.filter(Review.sku == sku)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(sort_by, sort_dir, rows[-1].sort_key, rows[-1].id)
 
-        # Сортировка
-        query = query.order_by(sort_method(sort_column))
+        # Фото и видео страницы - двумя запросами по IN вместо JOIN (фото x видео на отзыв)
+        page_ids = [row.id for row in rows]
+        photos = {review_id: [] for review_id in page_ids}
+        videos = {review_id: [] for review_id in page_ids}
+        if page_ids:
+            photo_rows = await db.execute(
+                select(Photo.review_id, Photo.url, Photo.width, Photo.height)
+                .where(Photo.review_id.in_(page_ids))
+                .order_by(Photo.id)
+            )
+            for p in photo_rows:
+                photos[p.review_id].append({"url": p.url, "width": p.width, "height": p.height})
 
-        # Пагинация
-        total = query.count()
-        results = query.offset(offset).limit(limit).all()
+            video_rows = await db.execute(
+                select(Video.review_id, Video.url, Video.preview_url, Video.short_video_preview_url)
+                .where(Video.review_id.in_(page_ids))
+                .order_by(Video.id)
+            )
+            for v in video_rows:
+                videos[v.review_id].append({
+                    "url": v.url,
+                    "preview_url": v.preview_url,
+                    "short_video_preview_url": v.short_video_preview_url
+                })
 
         reviews_data = []
-        for review in results:
+        for row in rows:
             # Формируем объект отзыва
             review_data = {
-                "review_id": review.id,
-                "client_id": review.client_id,
-                "sku": review.sku,
-                "product_name": review.product_info.product_name if review.product_info else f"Товар SKU: {review.sku}",
-                "review_text": review.text or "Отзыв отсутствует",
-                "rating": review.rating,
-                "published_at": review.published_at,
-                "status": review.status,
-                "photos": [{
-                    "url": p.url,
-                    "width": p.width,
-                    "height": p.height
-                } for p in review.photos],
-                "videos": [{
-                    "url": v.url,
-                    "preview_url": v.preview_url,
-                    "short_video_preview_url": v.short_video_preview_url
-                } for v in review.videos]
+                "review_id": row.id,
+                "client_id": row.client_id,
+                "sku": row.sku,
+                "product_name": row.product_name if row.product_info_id else f"Товар SKU: {row.sku}",
+                "review_text": row.text or "Отзыв отсутствует",
+                "rating": row.rating,
+                "published_at": row.published_at,
+                "status": row.status,
+                "photos": photos[row.id],
+                "videos": videos[row.id]
             }
 
-            if review.neural_response:
+            if row.response_id is not None:
                 review_data["neural_response"] = {
-                    "response_text": review.neural_response.response_text,
-                    "created_at": review.neural_response.created_at
+                    "response_text": row.response_text,
+                    "created_at": row.response_created_at
                 }
 
             reviews_data.append(review_data)
@@ -124,14 +247,17 @@ async def get_full_reviews_info(
             "total": total,
             "limit": limit,
             "offset": offset,
+            "next_cursor": next_cursor,
             "status_counts": status_counts,
             "response_stats": {
-                "total_reviews": response_stats.total,
-                "with_response": response_stats.with_response,
-                "without_response": response_stats.without_response
+                "total_reviews": total_reviews,
+                "with_response": with_response,
+                "without_response": total_reviews - with_response
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting reviews: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
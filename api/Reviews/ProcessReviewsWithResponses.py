@@ -1,32 +1,35 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.models import Review, NeuralResponse, Log
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
-from src.rabbitmq_scripts.SendToRabbitMQ import send_to_rabbitmq
+from src.rabbitmq_scripts.outbox_relay import outbox_row
 
 router = APIRouter()
 
 @router.post("/send_specific_review", tags=["Отзывы"])
 async def send_specific_review(
     review_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Отправляет в RabbitMQ конкретный отзыв по его ID
     """
     try:
         # Ищем отзыв с ответом нейросети
-        review_data = db.query(
-            Review,
-            NeuralResponse.response_text,
-            NeuralResponse.created_at
-        ).join(
-            NeuralResponse, Review.id == NeuralResponse.review_id
-        ).filter(
-            Review.id == review_id
-        ).first()
+        review_data = (await db.execute(
+            select(
+                Review,
+                NeuralResponse.response_text,
+                NeuralResponse.created_at
+            ).join(
+                NeuralResponse, Review.id == NeuralResponse.review_id
+            ).filter(
+                Review.id == review_id
+            )
+        )).first()
 
         if not review_data:
             raise HTTPException(status_code=404, detail="Отзыв с ответом не найден")
@@ -56,35 +59,34 @@ async def send_specific_review(
             "client_id":review.client_id
         }
 
-        # Отправляем в RabbitMQ
-        if not send_to_rabbitmq(message):
-            raise HTTPException(status_code=500, detail="Ошибка отправки в очередь")
-
+        # Сообщение, статус и лог пишутся одной транзакцией, в RabbitMQ сообщение переносит relay outbox
         try:
-            db.query(Review).filter(Review.id == review_id).update(
-                {"status": "InQueue"},
-                synchronize_session=False
+            db.add(outbox_row(message))
+            await db.execute(
+                update(Review)
+                .where(Review.id == review_id)
+                .values(status="InQueue")
+                .execution_options(synchronize_session=False)
             )
-            db.commit()
+
+            # Логируем успешную отправку
+            log_entry = Log(
+                timestamp=datetime.now().isoformat(),
+                status="SENT_TO_QUEUE",
+                message=f"Review {review.id} sent to queue manually"
+            )
+            db.add(log_entry)
+            await db.commit()
         except Exception as e:
-            db.rollback()
-            logger.error(f"Ошибка обновления статуса: {str(e)}")
+            await db.rollback()
+            logger.error(f"Ошибка постановки отзыва в очередь: {str(e)}")
             raise
 
-        # Логируем успешную отправку
-        log_entry = Log(
-            timestamp=datetime.now(),
-            status="SENT_TO_QUEUE",
-            message=f"Review {review.id} sent to queue manually"
-        )
-        db.add(log_entry)
-        db.commit()
-
         return {"status": "success", "message": "Отзыв отправлен в очередь"}
 
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error sending review {review_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
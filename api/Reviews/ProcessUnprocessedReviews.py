@@ -1,18 +1,20 @@
 import traceback
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
 
 from src.models import (
     Review,
     ProductInfo,
     NeuralResponse,
-    LogsNeuro
+    LogsNeuro,
+    ApiKeys
 )
-from src.database import get_db
+from src.database import get_async_db, async_session
 from src.utils.logger import get_logger
-from src.neural.neural_network import get_gpt_response
+from src.neural.neural_network import create_review_processor, claim_reviews, release_review_claims
 
 # Инициализация логгера
 logger = get_logger(__name__)
@@ -20,6 +22,8 @@ logger = get_logger(__name__)
 # Создание роутера
 router = APIRouter()
 
+review_processor = create_review_processor(async_session)
+
 # Тексты для замены пустых отзывов
 RATING_TEXTS = {
     1: "Товар ужасный, не рекомендую.",
@@ -30,7 +34,7 @@ RATING_TEXTS = {
 }
 
 @router.post("/process_unprocessed_reviews", tags=["Отзывы"])
-async def process_unprocessed_reviews(db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def process_unprocessed_reviews(db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
     """
     Обрабатывает отзывы без ответов нейронной сетью.
     
@@ -46,17 +50,29 @@ async def process_unprocessed_reviews(db: Session = Depends(get_db)) -> Dict[str
     try:
         logger.info("Начало обработки отзывов без ответов")
 
-        # Получаем отзывы без ответов
+        # Берём отзывы без ответов в аренду (review_claims): пока идёт генерация, их не возьмёт
+        # планировщик или параллельный вызов эндпоинта
+        review_ids = await claim_reviews(db, limit=100)
+        await db.commit()
+
         query = (
-            db.query(Review, ProductInfo)
+            # Колонки, а не ORM-объекты: после rollback в цикле они не истекают
+            select(
+                Review.id,
+                Review.text,
+                Review.sku,
+                Review.rating,
+                ProductInfo.product_name,
+                ApiKeys.YANDEX_GPT_API_KEY,
+                ApiKeys.yandex_gpt_folder
+            )
             .outerjoin(ProductInfo, Review.id == ProductInfo.review_id)
-            .outerjoin(NeuralResponse, Review.id == NeuralResponse.review_id)
-            .filter(NeuralResponse.id == None)  # Берем только отзывы без ответа
-            .limit(100)
+            .outerjoin(ApiKeys, Review.client_id == ApiKeys.OZON_CLIENT_ID)
+            .where(Review.id.in_(review_ids))
         )
         
         # Выполняем запрос
-        reviews = query.all()
+        reviews = (await db.execute(query)).all()
 
         if not reviews:
             logger.info("Нет отзывов без ответов для обработки")
@@ -66,20 +82,21 @@ async def process_unprocessed_reviews(db: Session = Depends(get_db)) -> Dict[str
         errors_count = 0
 
         # Обрабатываем каждый отзыв
-        for review, product_info in reviews:
+        for review in reviews:
             try:
                 logger.info(f"Обработка отзыва ID: {review.id}")
 
                 # Определяем текст для отправки в нейросеть
                 review_text = review.text if review.text else f"Рейтинг: {review.rating}/5"
                 
-                # Получаем название продукта
-                product_name = product_info.product_name if product_info else None
-                # Генерация ответа нейросетью
-                neural_response = get_gpt_response(
+                # Генерация ответа нейросетью (ключи Yandex GPT - клиента отзыва)
+                neural_response = await review_processor.get_gpt_response(
                     review_text=review_text,
-                    db=db,
-                    product_name=product_name,
+                    api_keys_dict={
+                        'YANDEX_GPT_API_KEY': review.YANDEX_GPT_API_KEY,
+                        'yandex_gpt_folder': review.yandex_gpt_folder
+                    },
+                    product_name=review.product_name,
                     sku=review.sku,
                     rating=review.rating
                 )
@@ -109,14 +126,15 @@ async def process_unprocessed_reviews(db: Session = Depends(get_db)) -> Dict[str
                 # Добавляем в сессию и сохраняем
                 db.add(new_response)
                 db.add(log_entry)
-                db.commit()
+                await release_review_claims(db, [review.id])
+                await db.commit()
                 
                 processed_count += 1
                 logger.info(f"Успешно обработан отзыв ID: {review.id}")
 
             except Exception as e:
                 # Откатываем транзакцию
-                db.rollback()
+                await db.rollback()
                 
                 # Логируем ошибку
                 error_msg = f"Ошибка обработки отзыва ID {review.id}: {str(e)}"
@@ -129,7 +147,8 @@ async def process_unprocessed_reviews(db: Session = Depends(get_db)) -> Dict[str
                     status="ERROR",
                     created_at=datetime.now().isoformat()
                 ))
-                db.commit()
+                await release_review_claims(db, [review.id])
+                await db.commit()
                 
                 errors_count += 1
 
@@ -0,0 +1,168 @@
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from fastapi import APIRouter, Query, HTTPException, Depends
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import get_async_db
+from src.models import SkuDailyStats, Review, ProductInfo
+from src.api.Reviews.ProductReport import parse_report_date, summarize_days
+from src.api.logger import logger
+import traceback
+
+router = APIRouter()
+
+MAX_REPORT_SKUS = 500
+# Окна скользящего среднего рейтинга, дней
+TREND_WINDOWS = (7, 30)
+
+
+def rolling_average_ratings(
+        rows: Sequence,
+        skus: List[int],
+        start: date,
+        end: date,
+        windows: Sequence[int] = TREND_WINDOWS
+) -> Dict[int, Dict[str, Dict[str, Optional[float]]]]:
+    """
+    Скользящий средний рейтинг по дням для всех SKU сразу.
+
+    Строки сводки раскладываются в матрицы SKU x день (сумма оценок и число
+    оценок), суммы окон считаются разностью накопленных сумм по оси дней, и
+    среднее за окно - отношение сумм. Дни без оценок в окне дают None.
+    rows должны покрывать start - (max(windows) - 1) .. end, чтобы первые дни
+    периода усреднялись по полному окну.
+    """
+    span_start = start - timedelta(days=max(windows) - 1)
+    n_days = (end - span_start).days + 1
+    sku_index = {sku: i for i, sku in enumerate(skus)}
+
+    rows = [r for r in rows if span_start <= r.day <= end]
+    row_sku = np.fromiter((sku_index[r.sku] for r in rows), dtype=np.int64, count=len(rows))
+    row_day = np.fromiter(((r.day - span_start).days for r in rows), dtype=np.int64, count=len(rows))
+
+    rating_sum = np.zeros((len(skus), n_days))
+    rated = np.zeros((len(skus), n_days))
+    rating_sum[row_sku, row_day] = np.fromiter((r.rating_sum for r in rows), dtype=np.float64, count=len(rows))
+    rated[row_sku, row_day] = np.fromiter((r.rated for r in rows), dtype=np.float64, count=len(rows))
+
+    # Накопленные суммы с нулевым столбцом: сумма окна, заканчивающегося в день t, = c[t + 1] - c[t + 1 - w]
+    sum_cum = np.pad(np.cumsum(rating_sum, axis=1), ((0, 0), (1, 0)))
+    rated_cum = np.pad(np.cumsum(rated, axis=1), ((0, 0), (1, 0)))
+    ends = np.arange((start - span_start).days + 1, n_days + 1)
+    labels = [(span_start + timedelta(days=int(t) - 1)).strftime("%Y-%m-%d") for t in ends]
+
+    trends = {sku: {} for sku in skus}
+    for window in windows:
+        window_sum = sum_cum[:, ends] - sum_cum[:, ends - window]
+        window_rated = rated_cum[:, ends] - rated_cum[:, ends - window]
+        average = np.divide(
+            window_sum, window_rated,
+            out=np.full(window_sum.shape, np.nan),
+            where=window_rated > 0
+        ).round(2)
+        for sku, i in sku_index.items():
+            trends[sku][f"{window}d"] = {
+                label: (None if np.isnan(value) else float(value))
+                for label, value in zip(labels, average[i])
+            }
+    return trends
+
+
+async def resolve_report_skus(
+        db: AsyncSession,
+        skus: Optional[List[int]],
+        ozon_client_id: Optional[str]
+) -> List[int]:
+    """SKU отчёта: переданный список или все SKU отзывов клиента"""
+    if skus:
+        return sorted(set(skus))
+    if not ozon_client_id:
+        raise HTTPException(status_code=400, detail="Нужно передать skus или ozon_client_id")
+    result = await db.execute(
+        select(ProductInfo.sku)
+        .join(Review, Review.id == ProductInfo.review_id)
+        .where(Review.client_id == ozon_client_id)
+        .distinct()
+        .order_by(ProductInfo.sku)
+    )
+    return list(result.scalars().all())
+
+
+@router.get("/reviews/product_report/batch", tags=["Отчеты"])
+async def get_products_reviews_report(
+    skus: Optional[List[int]] = Query(None, description="SKU товаров для отчета"),
+    ozon_client_id: Optional[str] = Query(None, description="Все SKU клиента, если skus не переданы"),
+    start_date: Optional[str] = Query(None, description="Начальная дата в формате YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Конечная дата в формате YYYY-MM-DD"),
+    trends: bool = Query(False, description="Добавить скользящий средний рейтинг за 7 и 30 дней"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Отчет /reviews/product_report сразу для набора SKU.
+
+    Дневные строки всех SKU читаются из sku_daily_stats одним запросом,
+    total_all_time - одним GROUP BY sku; метрики каждого SKU собираются
+    из его строк так же, как в отчете по одному товару.
+    """
+    try:
+        start_day = parse_report_date(start_date, "start_date")
+        end_day = parse_report_date(end_date, "end_date")
+
+        report_skus = await resolve_report_skus(db, skus, ozon_client_id)
+        if len(report_skus) > MAX_REPORT_SKUS:
+            raise HTTPException(status_code=400, detail=f"Не больше {MAX_REPORT_SKUS} SKU за запрос")
+
+        period = {"start_date": start_date, "end_date": end_date}
+        if not report_skus:
+            return {"period": period, "reports": []}
+
+        # Для трендов нужны дни до начала периода, чтобы первое окно было полным
+        load_from = start_day - timedelta(days=max(TREND_WINDOWS) - 1) if trends and start_day else start_day
+
+        days_query = select(SkuDailyStats).where(SkuDailyStats.sku.in_(report_skus))
+        if load_from:
+            days_query = days_query.where(SkuDailyStats.day >= load_from)
+        if end_day:
+            days_query = days_query.where(SkuDailyStats.day <= end_day)
+        rows = (await db.execute(
+            days_query.order_by(SkuDailyStats.sku, SkuDailyStats.day)
+        )).scalars().all()
+
+        totals_all_time = dict((await db.execute(
+            select(SkuDailyStats.sku, func.sum(SkuDailyStats.reviews))
+            .where(SkuDailyStats.sku.in_(report_skus))
+            .group_by(SkuDailyStats.sku)
+        )).all())
+
+        in_period = [r for r in rows if start_day is None or r.day >= start_day]
+        days_by_sku = {sku: list(days) for sku, days in groupby(in_period, key=lambda r: r.sku)}
+
+        sku_trends = {}
+        if trends and rows:
+            trend_start = start_day or min(r.day for r in rows)
+            trend_end = end_day or max(r.day for r in rows)
+            if trend_start <= trend_end:
+                sku_trends = rolling_average_ratings(rows, report_skus, trend_start, trend_end)
+
+        reports = []
+        for sku in report_skus:
+            report = {
+                "sku": sku,
+                **summarize_days(days_by_sku.get(sku, [])),
+                "total_all_time": int(totals_all_time.get(sku) or 0),
+            }
+            if trends:
+                report["trends"] = sku_trends.get(sku, {f"{window}d": {} for window in TREND_WINDOWS})
+            reports.append(report)
+
+        return {"period": period, "reports": reports}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating products report: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,86 @@
+import json
+import traceback
+from typing import AsyncIterator
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from src.models import Review, ProductInfo, ApiKeys
+from src.database import async_session
+from src.neural.neural_network import create_review_processor
+from src.api.logger import logger
+
+router = APIRouter()
+
+review_processor = create_review_processor(async_session)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Форматирует одно событие Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/reviews/{review_id}/regenerate/stream", tags=["Отзывы"])
+async def regenerate_review_response_stream(review_id: str):
+    """
+    Перегенерирует ответ на один отзыв и отдаёт текст по мере генерации (SSE).
+
+    События: `delta` - накопленный текст ответа, `done` - финальный текст
+    после сохранения в neural_responses, `error` - ошибка генерации.
+    """
+    async with async_session() as db:
+        row = (await db.execute(
+            select(
+                Review.id,
+                Review.text,
+                Review.sku,
+                Review.rating,
+                ProductInfo.product_name,
+                ApiKeys.YANDEX_GPT_API_KEY,
+                ApiKeys.yandex_gpt_folder
+            )
+            .outerjoin(ProductInfo, Review.id == ProductInfo.review_id)
+            .outerjoin(ApiKeys, Review.client_id == ApiKeys.OZON_CLIENT_ID)
+            .where(Review.id == review_id)
+        )).first()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Review not found")
+    if not row.YANDEX_GPT_API_KEY or not row.yandex_gpt_folder:
+        raise HTTPException(status_code=400, detail="Для клиента отзыва не заданы ключи Yandex GPT")
+
+    async def event_stream() -> AsyncIterator[str]:
+        response_text = ""
+        try:
+            async for response_text in review_processor.stream_gpt_response(
+                    review_text=row.text or "",
+                    api_keys_dict={
+                        'YANDEX_GPT_API_KEY': row.YANDEX_GPT_API_KEY,
+                        'yandex_gpt_folder': row.yandex_gpt_folder
+                    },
+                    product_name=row.product_name,
+                    sku=row.sku,
+                    rating=row.rating
+            ):
+                yield sse_event("delta", {"text": response_text})
+
+            if not response_text.strip():
+                raise ValueError("Нейросеть не вернула валидный ответ")
+
+            await review_processor.save_regenerated_response(
+                review_id=row.id,
+                review_text=row.text,
+                response_text=response_text
+            )
+            yield sse_event("done", {"review_id": row.id, "text": response_text})
+
+        except Exception as e:
+            logger.error(f"Error regenerating response for review {review_id}: {str(e)}\n{traceback.format_exc()}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,11 +1,12 @@
 import traceback
 import re
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from src.models import Review, NeuralResponse
-from src.database import get_db
+from src.database import get_async_db
 from src.schemas.UpdateResponseRequest import UpdateResponseRequestModel
 from src.api.logger import logger
 
@@ -25,7 +26,7 @@ def is_sql_injection(text: str) -> bool:
 async def update_review_response(
         review_id: str,
         request: UpdateResponseRequestModel,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Проверяем response_text на SQL-инъекции
@@ -33,35 +34,38 @@ async def update_review_response(
             raise HTTPException(status_code=400, detail="Potential SQL injection detected")
 
         # Проверяем существование отзыва
-        review = db.query(Review).filter_by(id=review_id).first()
+        review = await db.get(Review, review_id)
         if not review:
             raise HTTPException(status_code=404, detail="Review not found")
 
         # Ищем или создаем запись в neural_responses
-        response = db.query(NeuralResponse).filter_by(review_id=review_id).first()
+        response = (await db.execute(
+            select(NeuralResponse).filter_by(review_id=review_id)
+        )).scalars().first()
 
         if response:
             # Обновляем существующую запись
             response.response_text = request.response_text
-            response.created_at = datetime.now()
+            # created_at - строковая колонка, asyncpg не приводит datetime к varchar сам
+            response.created_at = datetime.now().isoformat()
         else:
             # Создаем новую запись
             response = NeuralResponse(
                 review_id=review_id,
                 response_text=request.response_text,
-                created_at=datetime.now()
+                created_at=datetime.now().isoformat()
             )
             db.add(response)
 
 
 
-        db.commit()
+        await db.commit()
         return request.response_text
 
     except HTTPException:
         raise  # Пробрасываем HTTPException как есть
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error updating response for review {review_id}: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(
             status_code=500,
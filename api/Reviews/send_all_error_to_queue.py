@@ -1,10 +1,11 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.models import Review, NeuralResponse, Log
-from src.database import get_db
+from src.database import get_async_db
 from src.api.logger import logger
-from src.rabbitmq_scripts.SendToRabbitMQ import send_to_rabbitmq
+from src.rabbitmq_scripts.outbox_relay import outbox_row
 
 router = APIRouter()
 
@@ -12,22 +13,27 @@ router = APIRouter()
 @router.post("/send_all_error_reviews_to_queue", tags=["Отзывы"])
 
 async def send_all_error_reviews_to_queue(
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """
     Отправляет в RabbitMQ все отзывы со статусом 'InQueueError' (Ошибка очереди)
     """
     try:
         # Получаем все отзывы с ошибкой и их ответы
-        error_reviews = db.query(
-            Review,
-            NeuralResponse.response_text,
-            NeuralResponse.created_at
-        ).join(
-            NeuralResponse, Review.id == NeuralResponse.review_id
-        ).filter(
-            Review.status == "InQueueError"
-        ).all()
+        error_reviews = (await db.execute(
+            # Колонки, а не ORM-объекты: после rollback в цикле они не истекают
+            select(
+                Review.id,
+                Review.text,
+                Review.client_id,
+                NeuralResponse.response_text,
+                NeuralResponse.created_at
+            ).join(
+                NeuralResponse, Review.id == NeuralResponse.review_id
+            ).filter(
+                Review.status == "InQueueError"
+            )
+        )).all()
 
         if not error_reviews:
             return {"status": "success", "count": 0, "message": "Нет отзывов с ошибкой для отправки"}
@@ -36,7 +42,8 @@ async def send_all_error_reviews_to_queue(
         failed_reviews = []
 
         for review_data in error_reviews:
-            review, response_text, created_at = review_data
+            review = review_data
+            response_text, created_at = review_data.response_text, review_data.created_at
 
             try:
                 # Форматируем дату (аналогично вашему коду)
@@ -60,20 +67,20 @@ async def send_all_error_reviews_to_queue(
                     "client_id": review.client_id
                 }
 
-                # Отправляем в RabbitMQ
-                if not send_to_rabbitmq(message):
-                    failed_reviews.append(review.id)
-                    continue
+                # В RabbitMQ сообщение переносит relay outbox после коммита
+                db.add(outbox_row(message))
 
                 # Обновляем статус отзыва
-                db.query(Review).filter(Review.id == review.id).update(
-                    {"status": "InQueue"},
-                    synchronize_session=False
+                await db.execute(
+                    update(Review)
+                    .where(Review.id == review.id)
+                    .values(status="InQueue")
+                    .execution_options(synchronize_session=False)
                 )
 
                 # Логируем успешную отправку
                 log_entry = Log(
-                    timestamp=datetime.now(),
+                    timestamp=datetime.now().isoformat(),
                     status="SENT_TO_QUEUE",
                     message=f"Review {review.id} resent to queue after error"
                 )
@@ -82,12 +89,12 @@ async def send_all_error_reviews_to_queue(
                 success_count += 1
 
             except Exception as e:
-                db.rollback()
+                await db.rollback()
                 logger.error(f"Error processing review {review.id}: {str(e)}")
                 failed_reviews.append(review.id)
                 continue
 
-        db.commit()
+        await db.commit()
 
         result = {
             "status": "success",
@@ -103,7 +110,7 @@ async def send_all_error_reviews_to_queue(
         return result
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error in send_all_error_reviews_to_queue: {str(e)}")
         raise HTTPException(
             status_code=500,
@@ -5,6 +5,7 @@ from src.api.Reviews.ReviewWithResponse import router as ReviewWithResponse
 from src.api.Reviews.ProcessReviewsWithResponses import router as ProcessReviewsWithEesponses
 from src.api.Reviews.ProcessUnprocessedReviews import router as ProcessUnprocessedReviews
 from src.api.Reviews.send_all_error_to_queue import router as send_all_error_to_queue
+from src.api.Reviews.RegenerateReviewStream import router as RegenerateReviewStream
 from src.api.ProductPrompts.UpdateProductPrompt import router as UpdateProductPromt
 from src.api.ProductPrompts.ProductPrompts import router as ProductPromts
 from src.api.ProductPrompts.SearchProductPrompts import router as SerchProductPrompts
@@ -18,6 +19,8 @@ from src.api.APIKeyManagement.CreateApi import router as CreateApi
 from src.api.APIKeyManagement.DeleteApi import router as DeliteApi
 from src.api.APIKeyManagement.GetApi import router as GetApi
 from src.api.Reviews.ProductReport import router as ProductReport
+from src.api.Reviews.ProductReportBatch import router as ProductReportBatch
+from src.api.Reviews.ExportReviews import router as ExportReviews
 from src.api.ReviewFilter.AllReviewFilter import router as AllReviewFilter
 from src.api.ReviewFilter.ChengeReviewFilter import router as ChengeReviewFilter
 from src.api.ReviewFilter.DeliteReviewFilter import router as DeliteReviewFilter
@@ -54,7 +57,10 @@ main_router.include_router(ReviewWithResponse)
 main_router.include_router(ProcessReviewsWithEesponses)
 main_router.include_router(ProcessUnprocessedReviews)
 main_router.include_router(ProductReport)
+main_router.include_router(ProductReportBatch)
 main_router.include_router(send_all_error_to_queue)
+main_router.include_router(RegenerateReviewStream)
+main_router.include_router(ExportReviews)
 
 # ReviewFilter
 
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Sequence, Tuple
+
+import orjson
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import ResourceVersion
+
+# Сколько секунд отданная страница переиспользуется для одинаковых запросов при той же версии
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '5'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '500'))
+
+
+async def resource_etag(db: AsyncSession, resources: Sequence[str]) -> str:
+    """Слабый ETag из версий ресурсов (resource_versions), без запросов к данным"""
+    versions = dict((await db.execute(
+        select(ResourceVersion.resource, ResourceVersion.version)
+        .where(ResourceVersion.resource.in_(resources))
+    )).all())
+    return 'W/"' + '.'.join(str(versions.get(resource, 0)) for resource in resources) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match совпадает с ETag (слабое сравнение)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in header.split(','))
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    # no-cache: браузер хранит ответ, но перед использованием переспрашивает сервер с If-None-Match
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
+
+
+def render_json(content: Any) -> bytes:
+    """orjson-кодирование как в ORJSONResponse"""
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(body: bytes, etag: str) -> Response:
+    return Response(content=body, media_type='application/json', headers=etag_headers(etag))
+
+
+def request_cache_key(request: Request, etag: str) -> Hashable:
+    """Ключ кэша: путь, параметры запроса (без учёта порядка) и версия ресурсов"""
+    return request.url.path, tuple(sorted(request.query_params.multi_items())), etag
+
+
+class ResponseCache:
+    """
+    Короткоживущий кэш готовых тел ответов с single-flight.
+
+    Ключ включает версию ресурса, поэтому после записи кэш не отдаёт старые
+    данные: новая версия - новый ключ. TTL ограничивает время жизни записи.
+    Одновременные промахи по одному ключу ждут одного построения ответа,
+    а не запускают одинаковые запросы к БД параллельно.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, bytes]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get_or_build(self, key: Hashable, build: Callable[[], Awaitable[bytes]]) -> bytes:
+        while True:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # Отменён запрос, который строил ответ, - строим сами
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            body = await build()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # ожидающих может не быть - помечаем исключение полученным
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(body)
+        self._store(key, body)
+        return body
+
+    def _store(self, key: Hashable, body: bytes) -> None:
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (now + self.ttl, body)
@@ -1,6 +1,7 @@
 # src/config.py
 import os
 from pathlib import Path
+from types import MappingProxyType
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
@@ -101,7 +102,9 @@ def get_api_keys():
     finally:
         db.close()
 
-headers = {
+# Общий неизменяемый набор заголовков seller-UI; клиентские наборы строятся копией:
+# {**headers, 'x-o3-company-id': client_id}
+headers = MappingProxyType({
                 'accept': 'application/json, text/plain, */*',
                 'accept-language': 'ru',
                 'content-type': 'application/json',
@@ -119,7 +122,7 @@ headers = {
                 'x-o3-company-id': 123,
                 'x-o3-language': 'ru',
                 'x-o3-page-type': 'review',
-            }
+            })
 
 # 7. Инициализация ключей при старте
 api_keys_data = get_api_keys()
\ No newline at end of file
@@ -1,3 +1,4 @@
+import os
 import psycopg2
 from psycopg2 import OperationalError
 from sqlalchemy import create_engine, text
@@ -6,7 +7,8 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session
 from fastapi import HTTPException
 from contextlib import contextmanager
-from typing import Generator
+from typing import AsyncGenerator, Callable, Generator, TypeVar
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 
 from src.core_settings import DB_CONFIG, DATABASE_URL ,DATABASE_URL_asy # вместо своего импорта
@@ -22,7 +24,15 @@ engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_recycle=3600)
 # Создание фабрики сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-engine_async = create_async_engine(DATABASE_URL_asy, echo=True)
+# Логирование каждого SQL-запроса только по флагу: на горячем пути API оно дорого
+engine_async = create_async_engine(
+    DATABASE_URL_asy,
+    echo=os.getenv('SQL_ECHO', 'False') == 'True',
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=int(os.getenv('DB_POOL_SIZE', '10')),
+    max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '20'))
+)
 
 # Создание асинхронной сессии
 async_session = sessionmaker(
@@ -110,3 +120,51 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         logger.debug("Закрыта сессия БД")
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Генератор асинхронных сессий для FastAPI Depends.
+
+    Yields:
+        AsyncSession: Асинхронная сессия базы данных SQLAlchemy
+
+    Raises:
+        HTTPException: При ошибке работы с БД
+    """
+    async with async_session() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Ошибка базы данных: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Ошибка базы данных: {str(e)}")
+
+
+T = TypeVar('T')
+
+
+async def run_in_sync_session(func: Callable[[Session], T]) -> T:
+    """
+    Выполняет синхронный код с обычной сессией в пуле потоков, не блокируя event loop.
+
+    Для участков, которые нельзя перевести на AsyncSession (синхронные библиотеки,
+    старый ORM-код); коммит и откат - на стороне func.
+
+    Args:
+        func: Функция, принимающая Session
+
+    Returns:
+        Результат func
+    """
+    def call():
+        db = SessionLocal()
+        try:
+            return func(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return await run_in_threadpool(call)
@@ -1,4 +1,6 @@
 import os
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 
@@ -6,10 +8,19 @@ from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.api import main_router
+from src.neural.neural_network import close_review_processors
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Буферы ответов эндпоинтов сбрасываются при остановке, а не теряются
+    await close_review_processors()
+
+
+app = FastAPI(lifespan=lifespan)
 
 DEBUG = os.getenv("DEBUG", "False") == "True"
 
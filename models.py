@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, DateTime, func, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, Text, DateTime, Date, func, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -16,6 +16,8 @@ class Review(Base):
     order_status = Column(String)
     is_rating_participant = Column(Boolean)
     client_id = Column(String)  # Новая колонка для client_id
+    # Время последнего изменения строки (триггер set_updated_at), водяной знак Parquet-снимков
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
 
     product_info = relationship("ProductInfo", back_populates="review", uselist=False)
     photos = relationship("Photo", back_populates="review")
@@ -35,7 +37,7 @@ class Comment(Base):
 class Photo(Base):
     __tablename__ = 'photos'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    review_id = Column(String, ForeignKey('reviews.id'))
+    review_id = Column(String, ForeignKey('reviews.id'), index=True)
     url = Column(String)
     width = Column(Integer)
     height = Column(Integer)
@@ -45,7 +47,7 @@ class Photo(Base):
 class Video(Base):
     __tablename__ = 'videos'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    review_id = Column(String, ForeignKey('reviews.id'))
+    review_id = Column(String, ForeignKey('reviews.id'), index=True)
     url = Column(String)
     preview_url = Column(String)
     short_video_preview_url = Column(String)
@@ -70,9 +72,42 @@ class NeuralResponse(Base):
     review_id = Column(String, ForeignKey('reviews.id'))
     response_text = Column(Text)
     created_at = Column(String)  # Время создания ответа
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
 
     review = relationship("Review", back_populates="neural_response")
 
+class ReviewCluster(Base):
+    __tablename__ = 'review_clusters'
+    review_id = Column(String, ForeignKey('reviews.id'), primary_key=True)
+    cluster_id = Column(String, nullable=False, index=True)  # id отзыва-представителя кластера
+    sku = Column(Integer)
+    rating = Column(Integer)
+    simhash = Column(String)  # SimHash нормализованного текста (hex)
+    created_at = Column(String)
+
+class QueueOutbox(Base):
+    __tablename__ = 'queue_outbox'
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Порядок отправки
+    review_id = Column(String, ForeignKey('reviews.id'), nullable=False, index=True)
+    payload = Column(Text, nullable=False)  # JSON сообщения для очереди reviews_ozon
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ReviewCounter(Base):
+    """Счётчики отзывов по (клиент, статус); ведутся триггерами на reviews и neural_responses,
+    периодически сверяются в parcer/review_counters.py"""
+    __tablename__ = 'review_counters'
+    client_id = Column(String, primary_key=True)  # '' для отзывов без client_id
+    status = Column(String, primary_key=True)  # '' для отзывов без статуса
+    reviews = Column(Integer, nullable=False, default=0)
+    with_response = Column(Integer, nullable=False, default=0)
+
+class ReviewClaim(Base):
+    """Аренда отзыва на генерацию ответа: ставится при выборке, снимается при записи ответа.
+    Отдельная таблица, чтобы аренда не меняла reviews и не будила её триггеры"""
+    __tablename__ = 'review_claims'
+    review_id = Column(String, ForeignKey('reviews.id', ondelete='CASCADE'), primary_key=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
 class LogsNeuro(Base):
     __tablename__ = 'logs_neuro'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -133,3 +168,28 @@ class PredefinedResponse(Base):
 
     id = Column(Integer, primary_key=True)
     text = Column(String, nullable=False)
+
+
+class SkuDailyStats(Base):
+    """Дневная сводка отзывов по SKU для отчётов; пополняется при сохранении новых отзывов,
+    правки и удаления учитываются периодическим пересчётом (parcer/sku_stats.py)"""
+    __tablename__ = 'sku_daily_stats'
+    sku = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)  # date(published_at) в часовом поясе БД
+    reviews = Column(Integer, nullable=False, default=0)
+    rated = Column(Integer, nullable=False, default=0)  # отзывы с оценкой (знаменатель среднего)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    with_photos = Column(Integer, nullable=False, default=0)
+    with_videos = Column(Integer, nullable=False, default=0)
+
+
+class ResourceVersion(Base):
+    """Версия ресурса API для ETag; увеличивается триггерами при коммите транзакции, изменившей ресурс"""
+    __tablename__ = 'resource_versions'
+    resource = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,109 @@
+# src/neural/dedup.py
+import hashlib
+import os
+import random
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEDUP_ENABLED = os.getenv('REVIEW_DEDUP_ENABLED', 'True').lower() == 'true'
+# Максимальное расстояние Хэмминга между SimHash, при котором тексты считаются почти одинаковыми
+DEDUP_MAX_DISTANCE = int(os.getenv('REVIEW_DEDUP_MAX_DISTANCE', '3'))
+# Кластеризуются только короткие шаблонные отзывы, длинные всегда получают свой ответ
+DEDUP_MAX_CHARS = int(os.getenv('REVIEW_DEDUP_MAX_CHARS', '200'))
+
+_NON_WORD = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+GREETINGS = (
+    "Здравствуйте!",
+    "Добрый день!",
+    "Приветствуем!",
+    "Доброго времени суток!",
+)
+# Приветствие снимается целым первым предложением, вместе с обращением по имени
+# ("Добрый день, Анна!"): имя относится к автору отзыва-представителя
+_GREETING_PREFIX = re.compile(
+    r"^(здравствуйте|добрый день|приветствуем|доброго времени суток)\b[^.!?]*[.!?]+\s*",
+    re.IGNORECASE
+)
+
+
+class TextCluster(NamedTuple):
+    """Группа почти одинаковых отзывов: ответ генерируется один раз для representative"""
+    representative: object
+    members: List[object]
+    fingerprint: int
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Приводит текст к виду для сравнения: регистр, ё, пунктуация, пробелы"""
+    text = (text or "").lower().replace("ё", "е")
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """64-битный SimHash по символьным триграммам нормализованного текста"""
+    if not text:
+        return 0
+
+    padded = f" {text} "
+    features = [padded[i:i + 3] for i in range(max(1, len(padded) - 2))]
+    weights = [0] * bits
+    for feature in features:
+        digest = int.from_bytes(
+            hashlib.blake2b(feature.encode("utf-8"), digest_size=bits // 8).digest(), "big"
+        )
+        for i in range(bits):
+            weights[i] += 1 if digest >> i & 1 else -1
+
+    return sum(1 << i for i in range(bits) if weights[i] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def cluster_reviews(
+        records: Iterable,
+        max_distance: int = DEDUP_MAX_DISTANCE,
+        max_chars: int = DEDUP_MAX_CHARS
+) -> List[TextCluster]:
+    """
+    Группирует отзывы по (sku, rating) и близости SimHash нормализованного текста.
+
+    Args:
+        records: Записи с атрибутами id, text, sku, rating
+        max_distance: Порог расстояния Хэмминга для попадания в кластер
+        max_chars: Отзывы длиннее порога не кластеризуются
+
+    Returns:
+        List[TextCluster]: Кластеры в порядке появления представителей
+    """
+    clusters: List[TextCluster] = []
+    buckets: Dict[Tuple, List[TextCluster]] = {}
+
+    for record in records:
+        normalized = normalize_text(record.text)
+        if len(normalized) > max_chars:
+            clusters.append(TextCluster(record, [record], simhash(normalized)))
+            continue
+
+        fingerprint = simhash(normalized)
+        bucket = buckets.setdefault((record.sku, record.rating), [])
+        for cluster in bucket:
+            if hamming_distance(cluster.fingerprint, fingerprint) <= max_distance:
+                cluster.members.append(record)
+                break
+        else:
+            cluster = TextCluster(record, [record], fingerprint)
+            bucket.append(cluster)
+            clusters.append(cluster)
+
+    return clusters
+
+
+def vary_response(response_text: str, seed: str) -> str:
+    """Дешёвая локальная вариация ответа для участников кластера (детерминирована по seed)"""
+    greeting = random.Random(seed).choice(GREETINGS)
+    return f"{greeting} {_GREETING_PREFIX.sub('', response_text, count=1)}"
@@ -0,0 +1,174 @@
+# src/neural/model_router.py
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LITE_MODEL = "yandexgpt-lite"
+FULL_MODEL = "yandexgpt"
+
+# Настройки маршрутизации (переопределяются через окружение)
+LONG_REVIEW_CHARS = int(os.getenv('YAGPT_LONG_REVIEW_CHARS', '400'))
+COMPLAINT_MAX_RATING = int(os.getenv('YAGPT_COMPLAINT_MAX_RATING', '3'))
+HEDGE_DELAY = float(os.getenv('YAGPT_HEDGE_DELAY', '5'))
+MIN_HEDGE_DELAY = float(os.getenv('YAGPT_MIN_HEDGE_DELAY', '0.5'))
+HEDGING_ENABLED = os.getenv('YAGPT_HEDGING', 'True').lower() == 'true'
+# Доля вызовов, которые можно хеджировать (дополнительные запросы - дополнительные деньги)
+HEDGE_BUDGET = float(os.getenv('YAGPT_HEDGE_BUDGET', '0.1'))
+HEDGE_BURST = float(os.getenv('YAGPT_HEDGE_BURST', '5'))
+
+
+class LatencyTracker:
+    """Скользящее окно задержек одной модели"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Возвращает q-перцентиль (0..100) или None, если замеров нет"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class ModelRouter:
+    """
+    Выбор модели YandexGPT под отзыв и хеджирование медленных запросов.
+
+    Короткие и пустые отзывы уходят в lite-модель, длинные жалобы - в полную.
+    Если ответ не пришёл за p95 задержки выбранной модели, отправляется
+    второй такой же запрос и берётся тот ответ, который придёт первым.
+
+    Хеджирование ограничено бюджетом: каждый вызов добавляет hedge_budget
+    жетона (не больше hedge_burst), хедж-запрос тратит один жетон, так что
+    хеджируется не больше hedge_budget вызовов в среднем.
+    """
+
+    def __init__(
+            self,
+            long_review_threshold: int = LONG_REVIEW_CHARS,
+            complaint_max_rating: int = COMPLAINT_MAX_RATING,
+            default_hedge_delay: float = HEDGE_DELAY,
+            min_hedge_delay: float = MIN_HEDGE_DELAY,
+            min_samples: int = 20,
+            hedging_enabled: bool = HEDGING_ENABLED,
+            hedge_budget: float = HEDGE_BUDGET,
+            hedge_burst: float = HEDGE_BURST
+    ):
+        self.long_review_threshold = long_review_threshold
+        self.complaint_max_rating = complaint_max_rating
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.hedging_enabled = hedging_enabled
+        self.hedge_budget = hedge_budget
+        self.hedge_burst = hedge_burst
+        self._hedge_tokens = hedge_burst
+        self._latency: Dict[str, LatencyTracker] = {}
+
+    def choose_model(self, review_text: Optional[str], rating: Optional[int]) -> str:
+        """Подбирает модель по длине отзыва и оценке"""
+        text = (review_text or "").strip()
+        is_complaint = rating is not None and rating <= self.complaint_max_rating
+        if len(text) >= self.long_review_threshold and (is_complaint or rating is None):
+            return FULL_MODEL
+        return LITE_MODEL
+
+    def tracker(self, model: str) -> LatencyTracker:
+        if model not in self._latency:
+            self._latency[model] = LatencyTracker()
+        return self._latency[model]
+
+    def hedge_delay(self, model: str) -> float:
+        """Задержка перед хедж-запросом: p95 модели, пока замеров мало - значение по умолчанию"""
+        tracker = self.tracker(model)
+        if len(tracker) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, tracker.percentile(95))
+
+    def _take_hedge_token(self) -> bool:
+        if self._hedge_tokens < 1:
+            return False
+        self._hedge_tokens -= 1
+        return True
+
+    async def _timed(
+            self,
+            model: str,
+            request: Callable[[str], Awaitable[str]],
+            call_started: Optional[float] = None
+    ) -> str:
+        started = time.monotonic()
+        call_started = started if call_started is None else call_started
+        try:
+            result = await request(model)
+        except asyncio.CancelledError:
+            # Отменённый (проигравший хедж) запрос учитывается временем от начала
+            # основного запроса - это нижняя оценка задержки модели. Собственное время
+            # хеджа, запущенного с опозданием, было бы маленьким и тянуло бы p95 вниз
+            self.tracker(model).observe(time.monotonic() - call_started)
+            raise
+        except Exception:
+            self.tracker(model).observe(time.monotonic() - started)
+            raise
+        self.tracker(model).observe(time.monotonic() - started)
+        return result
+
+    async def call(self, model: str, request: Callable[[str], Awaitable[str]]) -> str:
+        """
+        Выполняет request(model) с хеджированием.
+
+        Args:
+            model: Имя модели из choose_model
+            request: Корутина-фабрика, выполняющая один запрос к модели
+
+        Returns:
+            str: Текст первого успешного ответа
+        """
+        call_started = time.monotonic()
+        primary = asyncio.ensure_future(self._timed(model, request, call_started))
+        if not self.hedging_enabled:
+            return await primary
+        self._hedge_tokens = min(self.hedge_burst, self._hedge_tokens + self.hedge_budget)
+
+        tasks = {primary}
+        try:
+            delay = self.hedge_delay(model)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if self._take_hedge_token():
+                    logger.debug(f"Хедж-запрос к {model}: нет ответа за {delay:.2f} сек")
+                    tasks.add(asyncio.ensure_future(self._timed(model, request, call_started)))
+                else:
+                    logger.debug(f"Хедж-запрос к {model} пропущен: исчерпан бюджет хеджирования")
+
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+# Общий маршрутизатор процесса: задержки копятся по всем вызовам, а не в каждом экземпляре отдельно
+default_router = ModelRouter()
@@ -1,68 +1,183 @@
 # src/neural/neural_network.py
+import os
+import json
 import random
 import aiohttp
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, exists
-from typing import Dict, Optional, Any, List
-from datetime import datetime
+from sqlalchemy import select, delete, func, exists
+from sqlalchemy.dialects.postgresql import insert
+from typing import Dict, Optional, Any, List, AsyncIterator, NamedTuple
+from datetime import datetime, timedelta
 from sqlalchemy.exc import SQLAlchemyError
 
 from src.database import async_session
-from src.models import Review, ProductInfo, NeuralResponse, LogsNeuro, PredefinedResponse
+from src.models import Review, ProductInfo, NeuralResponse, LogsNeuro, PredefinedResponse, ReviewClaim
 from src.utils.logger import get_logger
 from src.neural.get_promt import get_prompt_for_sku
+from src.neural.model_router import ModelRouter, LITE_MODEL, default_router
+from src.neural.write_buffer import ResponseWriteBuffer
+from src.neural.dedup import DEDUP_ENABLED, TextCluster, cluster_reviews, vary_response
 
 logger = get_logger(__name__)
 
+# Адрес можно подменить на локальный фейковый сервер для тестов
+YAGPT_COMPLETION_URL = os.getenv(
+    'YAGPT_COMPLETION_URL',
+    "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+)
+
+# Через сколько секунд аренда в review_claims считается брошенной (обработчик упал, не записав ответ)
+CLAIM_LEASE_SECONDS = int(os.getenv('NEURAL_CLAIM_LEASE_SECONDS', '600'))
+
+
+class ReviewRecord(NamedTuple):
+    """Компактная запись отзыва для генерации ответа"""
+    id: str
+    text: Optional[str]
+    sku: Optional[int]
+    rating: Optional[int]
+    product_name: Optional[str]
+
+
+async def claim_reviews(db: AsyncSession, *conditions, limit: int = 100) -> List[str]:
+    """
+    Берёт в генерацию отзывы без ответа: записывает аренду в review_claims и возвращает их id.
+
+    Аренда ставится в транзакции выборки, поэтому после её коммита эти
+    отзывы не возьмут ни планировщик, ни эндпоинт, ни другой экземпляр,
+    пока ответ не записан или не истекла аренда CLAIM_LEASE_SECONDS. Строки
+    reviews только блокируются (FOR NO KEY UPDATE), но не меняются: триггеры
+    updated_at, счётчиков и версий ресурсов на аренду не срабатывают.
+    """
+    lease_expired = func.now() - timedelta(seconds=CLAIM_LEASE_SECONDS)
+    claimable = (
+        select(Review.id)
+        .where(
+            ~exists().where(NeuralResponse.review_id == Review.id),
+            ~exists().where(ReviewClaim.review_id == Review.id, ReviewClaim.claimed_at >= lease_expired),
+            *conditions
+        )
+        .order_by(Review.sku, Review.rating)
+        .limit(limit)
+        .with_for_update(of=Review, skip_locked=True, key_share=True)
+    )
+    stmt = insert(ReviewClaim).from_select(['review_id'], claimable)
+    result = await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['review_id'],
+            set_={'claimed_at': func.now()},
+            where=ReviewClaim.claimed_at < lease_expired
+        ).returning(ReviewClaim.review_id)
+    )
+    return list(result.scalars().all())
+
+
+async def release_review_claims(db: AsyncSession, review_ids: List[str]) -> None:
+    """Снимает аренду с отзывов (ответ записан или генерация не удалась)"""
+    if review_ids:
+        await db.execute(delete(ReviewClaim).where(ReviewClaim.review_id.in_(review_ids)))
+
 
 class ReviewProcessor:
-    def __init__(self, session_maker):
+    def __init__(self, session_maker, model_router: Optional[ModelRouter] = None):
         self.session_maker = session_maker
         self.predefined_responses = []
+        self.model_router = model_router or default_router
+        self.write_buffer = ResponseWriteBuffer(session_maker)
 
     async def process_unprocessed_reviews(self, api_keys_dict: Dict[str, Any]) -> Dict[str, int]:
-        """Основная функция обработки необработанных отзывов"""
-        processed = errors = 0
+        """
+        Основная функция обработки необработанных отзывов.
+
+        processed - ответы, которые уже записаны в БД; unsaved - сгенерированные,
+        но не записанные из-за ошибки сброса буфера (остаются в буфере до следующего
+        сброса); отклонённые БД строки буфера учитываются в errors.
+        """
+        errors = 0
+        buffered: List[str] = []  # id отзывов, ответы на которые поставлены в буфер
+        failed: List[str] = []  # id отзывов, с которых нужно снять аренду
 
         if not api_keys_dict.get('OZON_CLIENT_ID'):
             logger.error("Отсутствует OZON_CLIENT_ID в api_keys_dict")
-            return {"processed": 0, "errors": 0}
+            return {"processed": 0, "errors": 0, "unsaved": 0}
 
-        async with self.session_maker() as db:
-            try:
+        try:
+            # Сессия живёт только на время выборки: дальше в памяти остаются
+            # лишь компактные записи, без ORM-объектов и identity map
+            async with self.session_maker() as db:
                 await self._load_predefined_responses(db)
-                review_ids = await self._get_review_ids(db, api_keys_dict['OZON_CLIENT_ID'])
-
-                if not review_ids:
-                    return {"processed": 0, "errors": 0}
-
-                reviews_data = await self._get_reviews_data(db, review_ids)
-
-                for review, product_info in reviews_data:
-                    try:
-                        success = await self._process_single_review(
-                            db=db,
-                            review=review,
-                            product_info=product_info,
-                            api_key=api_keys_dict.get('YANDEX_GPT_API_KEY'),
-                            folder=api_keys_dict.get('yandex_gpt_folder')
-                        )
-                        if success:
-                            processed += 1
-                        else:
+                records = await self._get_review_records(db, api_keys_dict['OZON_CLIENT_ID'])
+                await db.commit()
+
+            if not records:
+                return {"processed": 0, "errors": 0, "unsaved": 0}
+
+            # Почти одинаковые отзывы по одному SKU и оценке получают один сгенерированный ответ
+            if DEDUP_ENABLED:
+                clusters = cluster_reviews(records)
+            else:
+                clusters = [TextCluster(record, [record], 0) for record in records]
+
+            api_key = api_keys_dict.get('YANDEX_GPT_API_KEY')
+            folder = api_keys_dict.get('yandex_gpt_folder')
+            for cluster in clusters:
+                record = cluster.representative
+                try:
+                    if len(cluster.members) > 1:
+                        # Кластеру раздаётся только настоящий ответ модели: если генерация
+                        # не удалась, каждый отзыв обрабатывается отдельно со своим резервным ответом
+                        response_text = await self._process_single_review(record, api_key, folder, fallback=False)
+                        if response_text is not None:
+                            buffered.append(record.id)
+                            buffered.extend(await self._apply_cluster_response(cluster, response_text))
+                            continue
+
+                    for member in cluster.members:
+                        record = member
+                        if await self._process_single_review(member, api_key, folder) is None:
                             errors += 1
-                    except Exception as e:
-                        await db.rollback()
-                        logger.error(f"Ошибка обработки отзыва {review.id}: {e}")
-                        errors += 1
+                            failed.append(member.id)
+                        else:
+                            buffered.append(member.id)
+                except Exception as e:
+                    logger.error(f"Ошибка обработки отзыва {record.id}: {e}")
+                    errors += 1
+                    failed.extend(m.id for m in cluster.members if not self.write_buffer.is_pending(m.id))
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка: {e}")
+            errors += 1
 
-                return {"processed": processed, "errors": errors}
+        try:
+            await self.write_buffer.flush()
+        except Exception as e:
+            pending = sum(1 for review_id in buffered if self.write_buffer.is_pending(review_id))
+            logger.error(f"Не удалось записать {pending} ответов (остались в буфере): {e}")
 
+        if failed:
+            try:
+                async with self.session_maker() as db:
+                    await release_review_claims(db, failed)
+                    await db.commit()
             except Exception as e:
-                await db.rollback()
-                logger.error(f"Критическая ошибка: {e}")
-                return {"processed": processed, "errors": errors + 1}
+                # Отметки истекут сами через CLAIM_LEASE_SECONDS
+                logger.error(f"Ошибка снятия отметок с {len(failed)} отзывов: {e}")
+
+        unsaved = sum(1 for review_id in buffered if self.write_buffer.is_pending(review_id))
+        processed = len(buffered) - unsaved
+        if buffered:
+            try:
+                # Ответ, отброшенный буфером как отклонённый БД, не считается обработанным
+                async with self.session_maker() as db:
+                    processed = (await db.execute(
+                        select(func.count()).select_from(NeuralResponse)
+                        .where(NeuralResponse.review_id.in_(buffered))
+                    )).scalar_one()
+                errors += len(buffered) - unsaved - processed
+            except Exception as e:
+                logger.error(f"Ошибка подсчёта записанных ответов: {e}")
+        return {"processed": processed, "errors": errors, "unsaved": unsaved}
 
     async def get_gpt_response(
             self,
@@ -72,91 +187,196 @@ class ReviewProcessor:
             sku: Optional[int] = None,
             rating: Optional[int] = None
     ) -> str:
-        """Получение ответа от Yandex GPT"""
+        """Получение ответа от Yandex GPT (при ошибке - резервный ответ)"""
         if not api_keys_dict.get('YANDEX_GPT_API_KEY'):
             raise ValueError("Отсутствует Yandex GPT API ключ")
         if not api_keys_dict.get('yandex_gpt_folder'):
             raise ValueError("Отсутствует Yandex GPT FOLDER")
 
+        try:
+            return await self._generate_response(review_text, api_keys_dict, product_name, sku, rating)
+        except Exception as e:
+            logger.error(f"Ошибка GPT: {e}")
+            return self._generate_fallback_response(product_name, rating)
+
+    async def _generate_response(
+            self,
+            review_text: str,
+            api_keys_dict: Dict[str, Any],
+            product_name: Optional[str],
+            sku: Optional[int],
+            rating: Optional[int]
+    ) -> str:
+        """Запрос к Yandex GPT без резервного ответа: ошибка пробрасывается вызывающему"""
+        # Сессия нужна только для промпта и не удерживается на время запроса к GPT
+        async with self.session_maker() as db:
+            system_prompt = await self._build_system_prompt(db, sku)
+        context = self._build_context(product_name, rating)
+        messages = self._prepare_messages(system_prompt, context, review_text)
+        model = self.model_router.choose_model(review_text, rating)
+
+        return await self.model_router.call(
+            model,
+            lambda m: self._call_yagpt_api(
+                folder=api_keys_dict['yandex_gpt_folder'],
+                api_key=api_keys_dict['YANDEX_GPT_API_KEY'],
+                messages=messages,
+                model=m
+            )
+        )
+
+    async def stream_gpt_response(
+            self,
+            review_text: str,
+            api_keys_dict: Dict[str, Any],
+            product_name: Optional[str] = None,
+            sku: Optional[int] = None,
+            rating: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Потоковое получение ответа от Yandex GPT: отдаёт накопленный текст по мере генерации"""
+        if not api_keys_dict.get('YANDEX_GPT_API_KEY'):
+            raise ValueError("Отсутствует Yandex GPT API ключ")
+        if not api_keys_dict.get('yandex_gpt_folder'):
+            raise ValueError("Отсутствует Yandex GPT FOLDER")
+
+        async with self.session_maker() as db:
+            if not self.predefined_responses:
+                await self._load_predefined_responses(db)
+            system_prompt = await self._build_system_prompt(db, sku)
+
+        context = self._build_context(product_name, rating)
+        messages = self._prepare_messages(system_prompt, context, review_text)
+
+        async for text in self._stream_yagpt_api(
+                api_key=api_keys_dict['YANDEX_GPT_API_KEY'],
+                folder=api_keys_dict['yandex_gpt_folder'],
+                messages=messages,
+                model=self.model_router.choose_model(review_text, rating)
+        ):
+            yield text
+
+    async def save_regenerated_response(
+            self,
+            review_id: str,
+            review_text: Optional[str],
+            response_text: str
+    ) -> None:
+        """Сохраняет перегенерированный ответ, заменяя существующий"""
+        now = datetime.now().isoformat()
         async with self.session_maker() as db:
             try:
-                system_prompt = await self._build_system_prompt(db, sku)
-                context = self._build_context(product_name, rating)
-                messages = self._prepare_messages(system_prompt, context, review_text)
-
-                return await self._call_yagpt_api(
-                    folder=api_keys_dict['yandex_gpt_folder'],
-                    api_key=api_keys_dict['YANDEX_GPT_API_KEY'],
-                    messages=messages
+                await db.execute(
+                    insert(NeuralResponse).values(
+                        review_id=review_id,
+                        response_text=response_text,
+                        created_at=now
+                    ).on_conflict_do_update(
+                        constraint='uq_neural_response_review_id',
+                        set_={'response_text': response_text, 'created_at': now}
+                    )
                 )
-            except Exception as e:
-                logger.error(f"Ошибка GPT: {e}")
-                return self._generate_fallback_response(product_name, rating)
+                db.add(LogsNeuro(
+                    review_text=(review_text or "")[:500],
+                    response_text=response_text[:500],
+                    status='SUCCESS',
+                    created_at=now
+                ))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
 
     async def _load_predefined_responses(self, db: AsyncSession) -> None:
         """Загрузка шаблонных ответов из БД"""
         result = await db.execute(select(PredefinedResponse.text))
         self.predefined_responses = result.scalars().all()
 
-    async def _get_review_ids(self, db: AsyncSession, client_id: str) -> List[int]:
-        """Получение ID необработанных отзывов"""
-        return (await db.execute(
-            select(Review.id)
-            .where(and_(
-                Review.client_id == client_id,
-                Review.status == "UNPROCESSED",
-                ~exists().where(NeuralResponse.review_id == Review.id)
-            ))
-            .with_for_update(skip_locked=True)
-            .limit(100)
-        )).scalars().all()
-
-    async def _get_reviews_data(self, db: AsyncSession, review_ids: List[int]) -> List[tuple]:
-        """Получение данных отзывов и информации о товарах"""
-        return (await db.execute(
-            select(Review, ProductInfo)
+    async def _get_review_records(self, db: AsyncSession, client_id: str) -> List[ReviewRecord]:
+        """Берёт в генерацию необработанные отзывы клиента (только нужные колонки, без ORM-объектов)"""
+        review_ids = await claim_reviews(db, Review.client_id == client_id, Review.status == "UNPROCESSED")
+        if not review_ids:
+            return []
+        rows = (await db.execute(
+            select(
+                Review.id,
+                Review.text,
+                Review.sku,
+                Review.rating,
+                ProductInfo.product_name
+            )
             .join(ProductInfo, Review.id == ProductInfo.review_id, isouter=True)
             .where(Review.id.in_(review_ids))
+            .order_by(Review.sku, Review.rating)
         )).all()
+        return [ReviewRecord(*row) for row in rows]
 
     async def _process_single_review(
             self,
-            db: AsyncSession,
-            review: Review,
-            product_info: Optional[ProductInfo],
+            record: ReviewRecord,
             api_key: Optional[str],
-            folder: Optional[str]
-    ) -> bool:
-        """Обработка одного отзыва"""
+            folder: Optional[str],
+            fallback: bool = True
+    ) -> Optional[str]:
+        """
+        Обработка одного отзыва, возвращает сохранённый ответ или None при ошибке.
+
+        С fallback=False ошибка модели не заменяется резервным ответом, а даёт None.
+        """
         if not api_key:
             raise ValueError("Отсутствует API ключ")
 
         try:
-            response_text = await self.get_gpt_response(
-                review_text=review.text or "",
+            generate = self.get_gpt_response if fallback else self._generate_response
+            response_text = await generate(
+                review_text=record.text or "",
                 api_keys_dict={
                     'YANDEX_GPT_API_KEY': api_key,
                     'yandex_gpt_folder': folder
                 },
-                product_name=product_info.product_name if product_info else None,
-                sku=review.sku,
-                rating=review.rating
+                product_name=record.product_name,
+                sku=record.sku,
+                rating=record.rating
             )
 
             await self._save_response(
-                db=db,
-                review_id=review.id,
-                review_text=review.text,
+                review_id=record.id,
+                review_text=record.text,
                 response_text=response_text
             )
-            return True
+            return response_text
         except Exception as e:
             await self._log_error(
-                db=db,
-                review_text=review.text,
+                review_text=record.text,
                 error=str(e)
             )
-            return False
+            return None
+
+    async def _apply_cluster_response(self, cluster: TextCluster, response_text: str) -> List[str]:
+        """Раздаёт ответ представителя остальным участникам кластера и пишет состав кластера"""
+        now = datetime.now().isoformat()
+        cluster_id = cluster.representative.id
+        applied = []
+
+        for member in cluster.members:
+            await self.write_buffer.add_cluster_member(
+                review_id=member.id,
+                cluster_id=cluster_id,
+                sku=member.sku,
+                rating=member.rating,
+                fingerprint=cluster.fingerprint,
+                created_at=now
+            )
+            if member.id == cluster_id:
+                continue
+            await self._save_response(
+                review_id=member.id,
+                review_text=member.text,
+                response_text=vary_response(response_text, seed=member.id)
+            )
+            applied.append(member.id)
+
+        logger.info(f"Ответ отзыва {cluster_id} применён к {len(applied)} похожим отзывам")
+        return applied
 
     async def _build_system_prompt(self, db: AsyncSession, sku: Optional[int]) -> str:
         """Создание системного промпта для GPT"""
@@ -194,10 +414,16 @@ class ReviewProcessor:
             }
         ]
 
-    async def _call_yagpt_api(self, api_key: str, folder: str, messages: List[Dict]) -> str:
+    async def _call_yagpt_api(
+            self,
+            api_key: str,
+            folder: str,
+            messages: List[Dict],
+            model: str = LITE_MODEL
+    ) -> str:
         """Вызов API Yandex GPT"""
         payload = {
-            "modelUri": f"gpt://{folder}/yandexgpt-lite",
+            "modelUri": f"gpt://{folder}/{model}",
             "completionOptions": {
                 "stream": False,
                 "temperature": 0.6,
@@ -209,7 +435,7 @@ class ReviewProcessor:
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.post(
-                        "https://llm.api.cloud.yandex.net/foundationModels/v1/completion",
+                        YAGPT_COMPLETION_URL,
                         headers={
                             "Content-Type": "application/json",
                             "Authorization": f"Api-Key {api_key}"
@@ -227,50 +453,73 @@ class ReviewProcessor:
             logger.error(f"Ошибка вызова API: {e}")
             raise
 
+    async def _stream_yagpt_api(
+            self,
+            api_key: str,
+            folder: str,
+            messages: List[Dict],
+            model: str = LITE_MODEL
+    ) -> AsyncIterator[str]:
+        """Потоковый вызов API Yandex GPT (stream: true, ответ - JSON по строкам)"""
+        payload = {
+            "modelUri": f"gpt://{folder}/{model}",
+            "completionOptions": {
+                "stream": True,
+                "temperature": 0.6,
+                "maxTokens": 1000,
+            },
+            "messages": messages
+        }
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                    YAGPT_COMPLETION_URL,
+                    headers={
+                        "Content-Type": "application/json",
+                        "Authorization": f"Api-Key {api_key}"
+                    },
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=None, sock_read=30)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise ValueError(f"Ошибка API {response.status}: {error_text}")
+
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    # Каждый чанк содержит весь сгенерированный к этому моменту текст
+                    yield chunk['result']['alternatives'][0]['message']['text']
+
     async def _save_response(
             self,
-            db: AsyncSession,
             review_id: str,
             review_text: Optional[str],
             response_text: str
     ) -> None:
-        """Сохранение ответа в БД"""
-        now = datetime.now().isoformat()
-        try:
-            db.add(NeuralResponse(
-                review_id=review_id,
-                response_text=response_text,
-                created_at=now
-            ))
-            db.add(LogsNeuro(
-                review_text=(review_text or "")[:500],
-                response_text=response_text[:500],
-                status='SUCCESS',
-                created_at=now
-            ))
-            await db.commit()
-        except Exception as e:
-            await db.rollback()
-            raise
+        """Сохранение ответа в БД (через буфер отложенной записи)"""
+        await self.write_buffer.add_response(
+            review_id=review_id,
+            review_text=review_text,
+            response_text=response_text,
+            created_at=datetime.now().isoformat()
+        )
 
     async def _log_error(
             self,
-            db: AsyncSession,
             review_text: Optional[str],
             error: str
     ) -> None:
-        """Логирование ошибки в БД"""
-        now = datetime.now().isoformat()
+        """Логирование ошибки в БД (через буфер отложенной записи)"""
         try:
-            db.add(LogsNeuro(
-                review_text=(review_text or "")[:500],
-                response_text=error[:500],
-                status='ERROR',
-                created_at=now
-            ))
-            await db.commit()
+            await self.write_buffer.add_error(
+                review_text=review_text,
+                error=error,
+                created_at=datetime.now().isoformat()
+            )
         except Exception as e:
-            await db.rollback()
             logger.error(f"Ошибка записи лога ошибки: {e}")
 
     def _generate_fallback_response(self, product_name: Optional[str], rating: Optional[int]) -> str:
@@ -281,9 +530,32 @@ class ReviewProcessor:
         if rating is not None and rating < 4:
             base_response += " Приносим извинения за доставленные неудобства."
         return base_response
+
+
+_processors: Dict[Any, "ReviewProcessor"] = {}
+
+
 def create_review_processor(session_maker):
-    """Создаёт и возвращает экземпляр ReviewProcessor"""
-    return ReviewProcessor(session_maker)
+    """
+    Возвращает общий для процесса ReviewProcessor этой фабрики сессий.
+
+    Один экземпляр - один буфер записи, который не теряется между вызовами;
+    маршрутизатор моделей общий у всех экземпляров (default_router).
+    """
+    if session_maker not in _processors:
+        _processors[session_maker] = ReviewProcessor(session_maker)
+    return _processors[session_maker]
+
+
+async def close_review_processors() -> None:
+    """Сбрасывает буферы записи общих процессоров; вызывается при остановке процесса"""
+    for processor in list(_processors.values()):
+        try:
+            await processor.write_buffer.close()
+        except Exception as e:
+            # Аренды несброшенных отзывов истекут через CLAIM_LEASE_SECONDS
+            logger.error(f"Не удалось сбросить буфер ответов при остановке ({len(processor.write_buffer)} строк): {e}")
+
 
 # Альтернативный вариант для обратной совместимости
 async def get_gpt_response(
@@ -295,7 +567,7 @@ async def get_gpt_response(
         session_maker=async_session
 ):
     """Совместимая версия функции get_gpt_response"""
-    processor = ReviewProcessor(session_maker)
+    processor = create_review_processor(session_maker)
     return await processor.get_gpt_response(
         review_text=review_text,
         api_keys_dict=api_keys_dict,
@@ -306,5 +578,5 @@ async def get_gpt_response(
 
 async def process_unprocessed_reviews(api_keys_dict: Dict[str, Any], session_maker=async_session):
     """Совместимая версия функции process_unprocessed_reviews"""
-    processor = ReviewProcessor(session_maker)
-    return await processor.process_unprocessed_reviews(api_keys_dict)
\ No newline at end of file
+    processor = create_review_processor(session_maker)
+    return await processor.process_unprocessed_reviews(api_keys_dict)
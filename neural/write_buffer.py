@@ -0,0 +1,250 @@
+# src/neural/write_buffer.py
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert as sa_insert, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from src.models import NeuralResponse, LogsNeuro, ReviewCluster, ReviewClaim
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FLUSH_MAX_ITEMS = int(os.getenv('NEURAL_FLUSH_MAX_ITEMS', '100'))
+FLUSH_INTERVAL_MS = int(os.getenv('NEURAL_FLUSH_INTERVAL_MS', '2000'))
+
+
+class ResponseWriteBuffer:
+    """
+    Буфер отложенной записи ответов нейросети и строк logs_neuro.
+
+    Строки копятся в памяти и сбрасываются многострочными INSERT одной
+    транзакцией, когда набирается max_items строк или проходит interval_ms
+    с момента первой несброшенной записи. Вставка ответов идёт через
+    ON CONFLICT DO NOTHING по uq_neural_response_review_id, поэтому
+    повторный сброс или параллельный обработчик не ломают запись. В той же
+    транзакции с отзывов снимается аренда review_claims, поставленная при выборке.
+    """
+
+    def __init__(
+            self,
+            session_maker,
+            max_items: int = FLUSH_MAX_ITEMS,
+            interval_ms: int = FLUSH_INTERVAL_MS
+    ):
+        self.session_maker = session_maker
+        self.max_items = max_items
+        self.interval = interval_ms / 1000
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        self._logs: List[Dict[str, Any]] = []
+        self._clusters: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._first_pending_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._responses) + len(self._logs) + len(self._clusters)
+
+    def is_pending(self, review_id: str) -> bool:
+        """Ответ на отзыв ещё не записан в БД"""
+        return review_id in self._responses
+
+    async def add_response(
+            self,
+            review_id: str,
+            review_text: Optional[str],
+            response_text: str,
+            created_at: str
+    ) -> None:
+        """Ставит в очередь ответ и строку лога SUCCESS"""
+        self._responses[review_id] = {
+            'review_id': review_id,
+            'response_text': response_text,
+            'created_at': created_at
+        }
+        self._logs.append({
+            'review_text': (review_text or "")[:500],
+            'response_text': response_text[:500],
+            'status': 'SUCCESS',
+            'created_at': created_at
+        })
+        await self._on_added()
+
+    async def add_error(self, review_text: Optional[str], error: str, created_at: str) -> None:
+        """Ставит в очередь строку лога ERROR"""
+        self._logs.append({
+            'review_text': (review_text or "")[:500],
+            'response_text': error[:500],
+            'status': 'ERROR',
+            'created_at': created_at
+        })
+        await self._on_added()
+
+    async def add_cluster_member(
+            self,
+            review_id: str,
+            cluster_id: str,
+            sku: Optional[int],
+            rating: Optional[int],
+            fingerprint: int,
+            created_at: str
+    ) -> None:
+        """Ставит в очередь запись о принадлежности отзыва кластеру (для аудита)"""
+        self._clusters[review_id] = {
+            'review_id': review_id,
+            'cluster_id': cluster_id,
+            'sku': sku,
+            'rating': rating,
+            'simhash': f"{fingerprint:016x}",
+            'created_at': created_at
+        }
+        await self._on_added()
+
+    async def _on_added(self) -> None:
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+
+        if len(self) >= self.max_items or time.monotonic() - self._first_pending_at >= self.interval:
+            try:
+                await self.flush()
+            except Exception as e:
+                # Строки остались в буфере и уйдут при следующем сбросе
+                logger.error(f"Ошибка сброса буфера ответов: {e}")
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка отложенного сброса буфера ответов: {e}")
+
+    async def flush(self) -> int:
+        """
+        Сбрасывает накопленные строки в БД, возвращает количество записанных строк.
+
+        Если пакет нарушает ограничение (например, отзыв удалён, пока генерировался
+        ответ), строки записываются по одной: отклонённые БД отбрасываются с записью
+        в лог, чтобы одна такая строка не блокировала все следующие сбросы. При
+        других ошибках (нет соединения и т.п.) строки возвращаются в буфер.
+        """
+        async with self._lock:
+            if not self._responses and not self._logs and not self._clusters:
+                return 0
+
+            responses = list(self._responses.values())
+            logs = self._logs
+            clusters = list(self._clusters.values())
+            self._responses, self._logs, self._clusters = {}, [], {}
+            self._first_pending_at = None
+
+            try:
+                saved = await self._write(responses, logs, clusters)
+            except IntegrityError as e:
+                logger.warning(f"Пакет буфера ответов отклонён БД, запись по одной строке: {e}")
+                saved = await self._write_one_by_one(responses, logs, clusters)
+            except Exception:
+                self._restore(responses, logs, clusters)
+                raise
+
+            # Буфер пуст - отложенный сброс больше не нужен
+            if not self and self._timer and not self._timer.done() and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+
+            logger.debug(
+                f"Сброшено в БД: {saved} строк из {len(responses)} ответов, {len(logs)} строк логов, "
+                f"{len(clusters)} записей кластеров"
+            )
+            return saved
+
+    async def _write(
+            self,
+            responses: List[Dict[str, Any]],
+            logs: List[Dict[str, Any]],
+            clusters: List[Dict[str, Any]]
+    ) -> int:
+        """Записывает строки одной транзакцией; ответы и кластеры, пропущенные ON CONFLICT, не считаются"""
+        saved = 0
+        async with self.session_maker() as db:
+            try:
+                if responses:
+                    result = await db.execute(
+                        insert(NeuralResponse)
+                        .values(responses)
+                        .on_conflict_do_nothing(constraint='uq_neural_response_review_id')
+                        .returning(NeuralResponse.review_id)
+                    )
+                    saved += len(result.all())
+                    await db.execute(
+                        delete(ReviewClaim)
+                        .where(ReviewClaim.review_id.in_([row['review_id'] for row in responses]))
+                    )
+                if logs:
+                    await db.execute(sa_insert(LogsNeuro).values(logs))
+                    saved += len(logs)
+                if clusters:
+                    result = await db.execute(
+                        insert(ReviewCluster)
+                        .values(clusters)
+                        .on_conflict_do_nothing(index_elements=['review_id'])
+                        .returning(ReviewCluster.review_id)
+                    )
+                    saved += len(result.all())
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        return saved
+
+    async def _write_one_by_one(
+            self,
+            responses: List[Dict[str, Any]],
+            logs: List[Dict[str, Any]],
+            clusters: List[Dict[str, Any]]
+    ) -> int:
+        """Записывает каждый ответ и кластер отдельной транзакцией, логи - одним пакетом"""
+        batches = [([row], [], []) for row in responses] + [([], [], [row]) for row in clusters]
+        if logs:
+            batches.append(([], logs, []))
+
+        saved = 0
+        for index, batch in enumerate(batches):
+            try:
+                saved += await self._write(*batch)
+            except IntegrityError as e:
+                row = (batch[0] or batch[2] or [{}])[0]
+                logger.error(f"Строка буфера отброшена (отзыв {row.get('review_id')}): {e}")
+            except Exception:
+                # Непостоянная ошибка: оставшиеся строки ждут следующего сброса
+                for rest in batches[index:]:
+                    self._restore(*rest)
+                raise
+        return saved
+
+    def _restore(
+            self,
+            responses: List[Dict[str, Any]],
+            logs: List[Dict[str, Any]],
+            clusters: List[Dict[str, Any]]
+    ) -> None:
+        """Возвращает несброшенные строки в буфер, не затирая добавленные за время сброса"""
+        for row in responses:
+            self._responses.setdefault(row['review_id'], row)
+        self._logs = logs + self._logs
+        for row in clusters:
+            self._clusters.setdefault(row['review_id'], row)
+        self._first_pending_at = time.monotonic()
+
+    async def close(self) -> None:
+        """Останавливает таймер и сбрасывает остаток"""
+        if self._timer and not self._timer.done():
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
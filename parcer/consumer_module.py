@@ -1,41 +1,104 @@
 import os
 import json
-import pika
-from typing import Dict, Any
-from pika.adapters.blocking_connection import BlockingChannel
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+import asyncio
+import aiohttp
+import time
+import aio_pika
+from collections import deque
+from types import MappingProxyType
+from typing import Deque, Dict, Any, List, Optional, Set, NamedTuple, Mapping, Tuple
+from aio_pika.abc import AbstractIncomingMessage
+from sqlalchemy import String, column, func, select, update, values
 from src.config import headers
-from src.database import get_db
+from src.database import async_session
 from src.models import Review, ApiKeys
 from src.api.logger import logger
+from src.rabbitmq_scripts.SendToRabbitMQ import QUEUE_NAME, declare_tenant_exchange, declare_tenant_queue
 from datetime import datetime
 from pathlib import Path
-import requests
-import threading
-import time
+
+
+class ClientCredentials(NamedTuple):
+    """Закэшированные учётные данные клиента для отправки ответов"""
+    client_id: str
+    is_premium_plus: bool
+    api_key: Optional[str]
+    cookies: Optional[Dict[str, str]]
+    headers: Mapping[str, Any]  # неизменяемый набор заголовков seller-UI (вместе с Cookie)
+    api_headers: Optional[Mapping[str, str]]  # неизменяемый набор заголовков Premium Plus API
+    loaded_at: float
+
+
+class PendingReply(NamedTuple):
+    """Ответ, отправленный через seller-UI и ожидающий пакетного подтверждения"""
+    message: AbstractIncomingMessage
+    review_id: str
+    response_data: Dict[str, Any]
 
 
 class OzonConsumer:
-    def __init__(self):
-        self._connection = None
-        self._channel = None
+    def __init__(self, session_maker=async_session):
+        self.session_maker = session_maker
+        self._connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self._channel: Optional[aio_pika.abc.AbstractChannel] = None
+        # Потребители общей очереди и очередей клиентов: (очередь, consumer tag)
+        self._consumers: List[Tuple[aio_pika.abc.AbstractQueue, str]] = []
+        # Планировщик клиентов: у каждого клиента своя FIFO-очередь сообщений,
+        # в _ready_tenants стоят клиенты с работой (каждый не больше одного раза)
+        self._tenant_queues: Dict[str, Deque[AbstractIncomingMessage]] = {}
+        self._ready_tenants: Optional[asyncio.Queue] = None
+        self._scheduled_tenants: Set[str] = set()
+        self._workers: List[asyncio.Task] = []
+        self._credentials: Dict[str, ClientCredentials] = {}
+        self._credential_locks: Dict[str, asyncio.Lock] = {}
+        self._http_clients: Dict[Tuple[str, str], Tuple[Mapping, aiohttp.ClientSession]] = {}
+        self._pending_replies: Dict[str, Dict[str, PendingReply]] = {}
+        self._verify_task: Optional[asyncio.Task] = None
+        self._outcomes: List[Tuple[str, str, Optional[AbstractIncomingMessage]]] = []
+        self._response_log: List[str] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_timer: Optional[asyncio.Task] = None
         self._running = False
-        self._thread = None
 
         # Конфигурация RabbitMQ
         self.RABBITMQ_HOST = os.environ.get('RABBITMQ_HOST', '147.45.151.180')
         self.RABBITMQ_PORT = int(os.environ.get('RABBITMQ_PORT', '5672'))
         self.RABBITMQ_USERNAME = os.environ.get('RABBITMQ_USERNAME', 'admin')
         self.RABBITMQ_PASSWORD = os.environ.get('RABBITMQ_PASSWORD', 'Valera_228')
-        self.QUEUE_NAME = 'reviews_ozon'
-        
+        self.QUEUE_NAME = QUEUE_NAME
+        # Сколько сообщений брокер отдаёт без ack из каждой очереди (своя у каждого клиента
+        # и общая) и сколько клиентов обрабатывается одновременно. Prefetch с запасом:
+        # отправленные через seller-UI сообщения ждут пакетной сверки без ack
+        self.PREFETCH_COUNT = int(os.environ.get('RABBITMQ_PREFETCH_COUNT', '20'))
+        self.MAX_CONCURRENCY = int(os.environ.get('CONSUMER_MAX_CONCURRENCY', '10'))
+
         # Другие настройки
         self.RESPONSES_FILE = 'server_responses.txt'
         self.OZON_API_URL = "https://api-seller.ozon.ru/v1/review/comment/create"
         self.OZON_DIRECT_URL = "https://seller.ozon.ru/api/review/comment/create"
-        self.MAX_ATTEMPTS = 5
-        self.RETRY_DELAY = 5  # seconds
+        self.OZON_REVIEW_LIST_URL = "https://seller.ozon.ru/api/v3/review/list"
+        self.OZON_REVIEW_DETAIL_URL = "https://seller.ozon.ru/api/v2/review/detail"
+        # Ответы через seller-UI подтверждаются пакетно раз в VERIFY_INTERVAL сек по списку
+        # обработанных отзывов в окне дат пакета (не больше VERIFY_MAX_PAGES страниц на клиента);
+        # не найденные в списке проверяются точечно, не больше VERIFY_CONCURRENCY запросов сразу
+        self.VERIFY_INTERVAL = float(os.environ.get('CONSUMER_VERIFY_INTERVAL', '5'))
+        self.VERIFY_MAX_PAGES = int(os.environ.get('CONSUMER_VERIFY_MAX_PAGES', '3'))
+        self.VERIFY_CONCURRENCY = int(os.environ.get('CONSUMER_VERIFY_CONCURRENCY', '5'))
+        # Уровни отложенных повторов (сек): сообщение ждёт в очереди с TTL и
+        # через dead-letter возвращается в основную, consumer при этом не спит
+        self.RETRY_DELAYS = [
+            int(delay) for delay in os.environ.get('CONSUMER_RETRY_DELAYS', '5,30,120,600').split(',')
+        ]
+        self.PARKING_QUEUE_NAME = f'{self.QUEUE_NAME}.parking'
+        self.HTTP_TIMEOUT = aiohttp.ClientTimeout(total=10)
+        # Размер пула соединений HTTP-клиента одного клиента Ozon
+        self.HTTP_POOL_SIZE = int(os.environ.get('CONSUMER_HTTP_POOL_SIZE', '10'))
+        # Итоги обработки (статусы, ack, строки server_responses.txt) копятся и
+        # сбрасываются одной транзакцией по размеру или раз в окно (мс)
+        self.FLUSH_MAX_ITEMS = int(os.environ.get('CONSUMER_FLUSH_MAX_ITEMS', '50'))
+        self.FLUSH_INTERVAL = int(os.environ.get('CONSUMER_FLUSH_INTERVAL_MS', '200')) / 1000
+        # Время жизни кэша ключей/cookies клиента (сек)
+        self.CREDENTIALS_TTL = int(os.environ.get('CONSUMER_CREDENTIALS_TTL', '300'))
 
         # Базовые заголовки для Ozon API
         self.OZON_HEADERS = {
@@ -46,292 +109,673 @@ class OzonConsumer:
         Path("logs").mkdir(exist_ok=True)
 
     def save_server_response(self, response_data: Dict[str, Any], client_id: str, review_id: str):
-        """Сохраняет ответ сервера в текстовый файл"""
-        try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_entry = {
-                "timestamp": timestamp,
-                "client_id": client_id,
-                "review_id": review_id,
-                "response": response_data
-            }
+        """Ставит ответ сервера в очередь записи в текстовый файл (пишется в flush_outcomes)"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_entry = {
+            "timestamp": timestamp,
+            "client_id": client_id,
+            "review_id": review_id,
+            "response": response_data
+        }
+        self._response_log.append(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        self._schedule_flush()
 
+    def _write_server_responses(self, lines: List[str]):
+        try:
             with open(f"logs/{self.RESPONSES_FILE}", "a", encoding="utf-8") as f:
-                f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-
+                f.writelines(lines)
         except Exception as e:
             logger.error(f"Ошибка при записи ответа сервера: {str(e)}")
 
-    def check_premium_plus(self, db: Session, client_id: str) -> bool:
+    async def _load_credentials(self, client_id: str) -> ClientCredentials:
+        """Читает ключи клиента из БД и один раз разбирает cookies и заголовки"""
+        async with self.session_maker() as db:
+            row = (await db.execute(
+                select(
+                    ApiKeys.IS_PREMIUM_PLUS,
+                    ApiKeys.OZON_API_KEY,
+                    ApiKeys.CUSTUMER_COOKIES
+                ).where(ApiKeys.OZON_CLIENT_ID == client_id)
+            )).first()
+
+        if not row:
+            logger.error(f"No API keys found for client {client_id}")
+            raise ValueError(f"No API keys found for client {client_id}")
+
+        cookies = None
+        if row.CUSTUMER_COOKIES:
+            cookies = {}
+            for cookie_item in row.CUSTUMER_COOKIES.split(';'):
+                key_value = cookie_item.strip().split('=', 1)
+                if len(key_value) == 2:
+                    key, value = key_value
+                    cookies[key] = value
+            cookies['sc_company_id'] = str(client_id)
+
+        seller_headers = {**headers, 'x-o3-company-id': str(client_id)}
+        if cookies:
+            seller_headers['Cookie'] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+
+        api_headers = None
+        if row.OZON_API_KEY:
+            api_headers = MappingProxyType({
+                **self.OZON_HEADERS,
+                "Client-Id": str(client_id),
+                "Api-Key": row.OZON_API_KEY
+            })
+
+        return ClientCredentials(
+            client_id=client_id,
+            is_premium_plus=bool(row.IS_PREMIUM_PLUS),
+            api_key=row.OZON_API_KEY,
+            cookies=cookies,
+            headers=MappingProxyType(seller_headers),
+            api_headers=api_headers,
+            loaded_at=time.monotonic()
+        )
+
+    async def get_credentials(self, client_id: str) -> ClientCredentials:
+        """Возвращает учётные данные клиента из кэша, перечитывая их из БД по истечении TTL"""
+        cached = self._credentials.get(client_id)
+        if cached and time.monotonic() - cached.loaded_at < self.CREDENTIALS_TTL:
+            return cached
+
+        lock = self._credential_locks.setdefault(client_id, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, данные мог загрузить другой обработчик
+            cached = self._credentials.get(client_id)
+            if cached and time.monotonic() - cached.loaded_at < self.CREDENTIALS_TTL:
+                return cached
+            credentials = await self._load_credentials(client_id)
+            self._credentials[client_id] = credentials
+            return credentials
+
+    def invalidate_credentials(self, client_id: Optional[str] = None):
+        """Сбрасывает кэш учётных данных одного клиента или всех клиентов"""
+        if client_id is None:
+            self._credentials.clear()
+        else:
+            self._credentials.pop(client_id, None)
+
+    def _invalidate_on_auth_error(self, error: Exception, client_id: str):
+        if isinstance(error, aiohttp.ClientResponseError) and error.status in (401, 403):
+            logger.warning(f"Ozon отклонил авторизацию клиента {client_id}, кэш ключей сброшен")
+            self.invalidate_credentials(client_id)
+
+    def _http_client(self, kind: str, client_id: str, header_set: Mapping) -> aiohttp.ClientSession:
+        """
+        Возвращает пул соединений клиента для 'api' (Premium Plus) или 'seller' (seller-UI).
+
+        Заголовки (и cookies) зашиты в сессию при создании и не меняются. Если после
+        перечитывания ключей набор заголовков изменился, создаётся новая сессия, а
+        старая закрывается с задержкой, чтобы дать завершиться запросам в полёте.
+        """
+        key = (client_id, kind)
+        entry = self._http_clients.get(key)
+        if entry and not entry[1].closed:
+            if entry[0] == header_set:
+                return entry[1]
+            self._retire_http_client(entry[1])
+
+        session = aiohttp.ClientSession(
+            headers=header_set,
+            timeout=self.HTTP_TIMEOUT,
+            connector=aiohttp.TCPConnector(limit=self.HTTP_POOL_SIZE, ttl_dns_cache=300),
+            cookie_jar=aiohttp.DummyCookieJar()
+        )
+        self._http_clients[key] = (header_set, session)
+        return session
+
+    def _retire_http_client(self, session: aiohttp.ClientSession):
+        asyncio.get_running_loop().call_later(
+            self.HTTP_TIMEOUT.total + 5, lambda: asyncio.ensure_future(session.close())
+        )
+
+    async def _close_http_clients(self):
+        for _, session in self._http_clients.values():
+            if not session.closed:
+                await session.close()
+        self._http_clients.clear()
+
+    async def check_premium_plus(self, client_id: str) -> bool:
         """Проверяет, есть ли у клиента подписка Premium Plus"""
-        api_key = db.query(ApiKeys).filter(ApiKeys.OZON_CLIENT_ID == client_id).first()
-        return bool(api_key and api_key.IS_PREMIUM_PLUS)
+        return (await self.get_credentials(client_id)).is_premium_plus
 
-    def get_client_cookies_and_headers(self, db: Session, client_id: str) -> tuple:
+    async def get_client_cookies_and_headers(self, client_id: str) -> tuple:
         """Получает cookies и headers для конкретного клиента"""
-        api_key_record = db.query(ApiKeys).filter(ApiKeys.OZON_CLIENT_ID == client_id).first()
+        credentials = await self.get_credentials(client_id)
 
-        if not api_key_record:
-            logger.error(f"No API keys found for client {client_id}")
-            raise ValueError(f"No API keys found for client {client_id}")
-
-        if not api_key_record.CUSTUMER_COOKIES:
+        if not credentials.cookies:
             logger.error(f"No cookies found for client {client_id}")
             raise ValueError(f"No cookies found for client {client_id}")
 
-        cookies = {}
-        for cookie_item in api_key_record.CUSTUMER_COOKIES.split(';'):
-            key_value = cookie_item.strip().split('=', 1)
-            if len(key_value) == 2:
-                key, value = key_value
-                cookies[key] = value
-
-        cookies['sc_company_id'] = str(client_id)
-
-        headers['x-o3-company-id'] = str(client_id)
+        return credentials.cookies, credentials.headers
 
-        return cookies, headers
+    async def send_to_ozon_direct(self, review_uuid: str, text: str, client_id: str) -> Dict[str, Any]:
+        """
+        Отправляет ответ на отзыв напрямую через веб-интерфейс Ozon, одна попытка без ожиданий.
 
-    def send_to_ozon_direct(self, review_uuid: str, text: str, client_id: str) -> Dict[str, Any]:
-        """Отправляет ответ на отзыв напрямую через веб-интерфейс Ozon и проверяет статус обработки"""
-        db = next(get_db())
+        Статус обработки здесь не проверяется: успешно отправленный ответ
+        подтверждается пакетно в verify_pending_replies.
+        """
         try:
-            cookies, headers = self.get_client_cookies_and_headers(db, client_id)
-            api_key = db.query(ApiKeys).filter(ApiKeys.OZON_CLIENT_ID == client_id).first()
-            if not api_key:
-                raise ValueError(f"API ключи для client_id {client_id} не найдены")
+            _, client_headers = await self.get_client_cookies_and_headers(client_id)
+            session = self._http_client('seller', client_id, client_headers)
 
-            # Первый запрос - отправка ответа на отзыв
             json_data = {
                 'text': text,
                 'review_uuid': review_uuid,
                 'company_type': 'seller',
                 'company_id': client_id
             }
+            async with session.post(self.OZON_DIRECT_URL, json=json_data) as response:
+                response.raise_for_status()
+                response_data = await response.json()
 
-            response = requests.post(
-                self.OZON_DIRECT_URL,
-                cookies=cookies,
-                headers=headers,
-                json=json_data,
-                timeout=10
-            )
-            response.raise_for_status()
-            response_data = response.json()
-            for attempt in range(1, self.MAX_ATTEMPTS + 1):
-                try:
-                    if response_data.get('result', False):
-                        # Если ответ успешен, делаем второй запрос для проверки статуса
-                        status_check_data = {
-                            'company_id': client_id,
-                            'company_type': 'seller',
-                            'review_uuid': review_uuid,
-                        }
-
-                        status_response = requests.post(
-                            'https://seller.ozon.ru/api/v2/review/detail',
-                            cookies=cookies,
-                            headers=headers,
-                            json=status_check_data,
-                            timeout=10
-                        )
-                        status_response.raise_for_status()
-                        status_data = status_response.json()
-
-                        # Проверяем статус обработки
-                        interaction_status = status_data.get('interaction_status', '').lower()
-                        if interaction_status in ('processed', 'process'):
-                            self.save_server_response(response_data, client_id, review_uuid)
-                            return response_data
-                        else:
-                            # Если статус не PROCESSED, считаем это ошибкой и повторяем
-                            raise ValueError(f"Неверный статус обработки отзыва: {interaction_status}")
-
-                    if attempt < self.MAX_ATTEMPTS:
-                        logger.warning(
-                            f"Попытка {attempt} из {self.MAX_ATTEMPTS}: Ошибка в ответе Ozon Direct. Повтор через {self.RETRY_DELAY} сек...")
-                        time.sleep(self.RETRY_DELAY)
-                        continue
-
-                    raise ValueError(f"Неверный ответ от Ozon Direct после {self.MAX_ATTEMPTS} попыток")
+            if not response_data.get('result', False):
+                raise ValueError(f"Неверный ответ от Ozon Direct: {response_data}")
 
-                except Exception as e:
-                    if attempt == self.MAX_ATTEMPTS:
-                        raise
-                    logger.warning(
-                        f"Попытка {attempt} из {self.MAX_ATTEMPTS}: Ошибка при отправке в Ozon Direct. Повтор через {self.RETRY_DELAY} сек...")
-                    time.sleep(self.RETRY_DELAY)
+            return response_data
 
         except Exception as e:
+            self._invalidate_on_auth_error(e, client_id)
             error_msg = f"Direct API error: {str(e)}"
             logger.error(error_msg)
             error_response = {"error": error_msg}
             self.save_server_response(error_response, client_id, review_uuid)
             return error_response
-        finally:
-            db.close()
 
-    def send_to_ozon_api(self, review_id: str, response_text: str, client_id: str) -> Dict[str, Any]:
-        """Отправляет ответ на отзыв через Ozon API (для Premium Plus)"""
-        db = next(get_db())
+    async def _fetch_processed_uuids(self, client_id: str, review_uuids: Set[str]) -> Set[str]:
+        """
+        Ищет отзывы пакета в списке обработанных отзывов клиента.
+
+        Список фильтруется окном дат публикации отзывов пакета (даты берутся из БД)
+        и листается от старых к новым, поэтому отзывы из бэклога находятся так же,
+        как свежие, а не теряются за первыми страницами новых отзывов.
+        """
+        async with self.session_maker() as db:
+            window = (await db.execute(
+                select(func.min(Review.published_at), func.max(Review.published_at))
+                .where(Review.id.in_(review_uuids))
+            )).first()
+
+        _, client_headers = await self.get_client_cookies_and_headers(client_id)
+        session = self._http_client('seller', client_id, client_headers)
+
+        payload = {
+            'with_counters': False,
+            'sort': {
+                'sort_by': 'PUBLISHED_AT',
+                'sort_direction': 'ASC',
+            },
+            'company_type': 'seller',
+            'filter': {
+                'interaction_status': ['PROCESSED'],
+            },
+            'company_id': int(client_id),
+        }
+        if window and window[0] is not None:
+            payload['filter']['published_at'] = {
+                'from': window[0].isoformat(),
+                'to': window[1].isoformat(),
+            }
+
+        remaining = set(review_uuids)
+        for _ in range(self.VERIFY_MAX_PAGES):
+            async with session.post(self.OZON_REVIEW_LIST_URL, json=payload) as response:
+                response.raise_for_status()
+                data = await response.json()
+
+            reviews = data.get('result') or []
+            remaining.difference_update(review.get('uuid') for review in reviews)
+            if not remaining or not reviews or not data.get('pagination_last_uuid'):
+                break
+            payload['pagination_last_uuid'] = data['pagination_last_uuid']
+            payload['pagination_last_timestamp'] = data.get('pagination_last_timestamp')
+
+        return set(review_uuids) - remaining
+
+    async def _check_reply_details(self, client_id: str, review_uuids: Set[str]) -> Set[str]:
+        """Точечно проверяет отзывы, не найденные в списке, не больше VERIFY_CONCURRENCY запросов сразу"""
+        semaphore = asyncio.Semaphore(self.VERIFY_CONCURRENCY)
+
+        async def check(review_uuid: str) -> Tuple[str, bool]:
+            async with semaphore:
+                return review_uuid, await self._check_reply_detail(client_id, review_uuid)
+
+        results = await asyncio.gather(*(check(review_uuid) for review_uuid in review_uuids))
+        return {review_uuid for review_uuid, processed in results if processed}
+
+    async def _check_reply_detail(self, client_id: str, review_uuid: str) -> bool:
+        """Точечная проверка статуса одного отзыва"""
         try:
-            for attempt in range(1, self.MAX_ATTEMPTS + 1):
-                try:
-                    api_key = db.query(ApiKeys).filter(ApiKeys.OZON_CLIENT_ID == client_id).first()
-                    if not api_key or not api_key.OZON_API_KEY:
-                        raise ValueError(f"API ключи для client_id {client_id} не найдены")
-
-                    headers = self.OZON_HEADERS.copy()
-                    headers["Client-Id"] = client_id
-                    headers["Api-Key"] = api_key.OZON_API_KEY
-
-                    payload = {
-                        "mark_review_as_processed": True,
-                        "parent_comment_id": None,
-                        "review_id": review_id,
-                        "text": response_text
-                    }
-
-                    response = requests.post(
-                        self.OZON_API_URL,
-                        headers=headers,
-                        json=payload,
-                        timeout=10
+            _, client_headers = await self.get_client_cookies_and_headers(client_id)
+            session = self._http_client('seller', client_id, client_headers)
+            status_check_data = {
+                'company_id': client_id,
+                'company_type': 'seller',
+                'review_uuid': review_uuid,
+            }
+            async with session.post(self.OZON_REVIEW_DETAIL_URL, json=status_check_data) as response:
+                response.raise_for_status()
+                status_data = await response.json()
+            return status_data.get('interaction_status', '').lower() in ('processed', 'process')
+        except Exception as e:
+            self._invalidate_on_auth_error(e, client_id)
+            logger.error(f"Ошибка проверки статуса отзыва {review_uuid}: {str(e)}")
+            return False
+
+    def _add_pending_reply(self, client_id: str, review_uuid: str, reply: PendingReply):
+        self._pending_replies.setdefault(client_id, {})[review_uuid] = reply
+
+    async def verify_pending_replies(self):
+        """Подтверждает накопленные ответы seller-UI одним листанием списка на клиента"""
+        pending, self._pending_replies = self._pending_replies, {}
+        if pending:
+            await asyncio.gather(*(
+                self._verify_client_replies(client_id, replies)
+                for client_id, replies in pending.items()
+            ))
+
+    async def _verify_client_replies(self, client_id: str, replies: Dict[str, PendingReply]):
+        confirmed: Set[str] = set()
+        try:
+            confirmed = await self._fetch_processed_uuids(client_id, set(replies))
+        except Exception as e:
+            self._invalidate_on_auth_error(e, client_id)
+            logger.error(f"Ошибка пакетной проверки ответов клиента {client_id}: {str(e)}")
+
+        # Точечная проверка только для отзывов, которых не оказалось в списке
+        missing = set(replies) - confirmed
+        if missing:
+            confirmed |= await self._check_reply_details(client_id, missing)
+
+        logger.info(
+            f"Клиент {client_id}: подтверждено {len(confirmed)} из {len(replies)} ответов "
+            f"(точечных проверок: {len(missing)})"
+        )
+
+        for review_uuid, reply in replies.items():
+            try:
+                if review_uuid in confirmed:
+                    self.save_server_response(reply.response_data, client_id, review_uuid)
+                    await self.complete_review(reply.review_id, "PROCESSED", reply.message)
+                else:
+                    # Отложенная повторная сверка: сообщение с x-posted вернётся через
+                    # очередь повтора и попадёт в следующий пакет без повторной отправки
+                    await self._schedule_retry(
+                        reply.message, reply.review_id, "Ответ не подтверждён статусом отзыва",
+                        posted=True
                     )
-                    response.raise_for_status()
-                    response_data = response.json()
+            except Exception as e:
+                # Ответ уже отправлен в Ozon: возврат сообщения брокеру без x-posted привёл бы
+                # к повторной отправке, поэтому оно остаётся без ack до следующей сверки
+                logger.error(f"Ошибка подтверждения отзыва {reply.review_id}: {str(e)}")
+                self._add_pending_reply(client_id, review_uuid, reply)
+
+    async def _verify_loop(self):
+        while True:
+            await asyncio.sleep(self.VERIFY_INTERVAL)
+            try:
+                await self.verify_pending_replies()
+            except Exception as e:
+                logger.error(f"Ошибка цикла подтверждения ответов: {str(e)}")
+
+    async def send_to_ozon_api(self, review_id: str, response_text: str, client_id: str) -> Dict[str, Any]:
+        """Отправляет ответ на отзыв через Ozon API (для Premium Plus), одна попытка без ожиданий"""
+        try:
+            credentials = await self.get_credentials(client_id)
+            if not credentials.api_headers:
+                raise ValueError(f"API ключи для client_id {client_id} не найдены")
 
-                    if 'comment_id' in response_data:
-                        self.save_server_response(response_data, client_id, review_id)
-                        return response_data
+            session = self._http_client('api', client_id, credentials.api_headers)
+            payload = {
+                "mark_review_as_processed": True,
+                "parent_comment_id": None,
+                "review_id": review_id,
+                "text": response_text
+            }
 
-                    if attempt < self.MAX_ATTEMPTS:
-                        logger.warning(
-                            f"Попытка {attempt} из {self.MAX_ATTEMPTS}: Ошибка в ответе Ozon API. Повтор через {self.RETRY_DELAY} сек...")
-                        time.sleep(self.RETRY_DELAY)
-                        continue
+            async with session.post(self.OZON_API_URL, json=payload) as response:
+                response.raise_for_status()
+                response_data = await response.json()
 
-                    raise ValueError(f"Неверный ответ от Ozon API после {self.MAX_ATTEMPTS} попыток")
+            if 'comment_id' not in response_data:
+                raise ValueError(f"Неверный ответ от Ozon API: {response_data}")
 
-                except Exception as e:
-                    if attempt == self.MAX_ATTEMPTS:
-                        raise
-                    logger.warning(
-                        f"Попытка {attempt} из {self.MAX_ATTEMPTS}: Ошибка при отправке в Ozon API. Повтор через {self.RETRY_DELAY} сек...")
-                    time.sleep(self.RETRY_DELAY)
+            self.save_server_response(response_data, client_id, review_id)
+            return response_data
 
         except Exception as e:
+            self._invalidate_on_auth_error(e, client_id)
             error_msg = f"Ozon API error: {str(e)}"
             logger.error(error_msg)
             error_response = {"error": error_msg}
             self.save_server_response(error_response, client_id, review_id)
             return error_response
-        finally:
-            db.close()
 
-    def update_review_status(self, db: Session, review_id: str, status: str):
-        """Обновляет статус отзыва"""
-        try:
-            db.query(Review).filter(Review.id == review_id).update(
-                {"status": status},
-                synchronize_session=False
+    async def complete_review(
+            self,
+            review_id: str,
+            status: str,
+            message: Optional[AbstractIncomingMessage] = None
+    ):
+        """
+        Ставит итог обработки отзыва в очередь группового сброса.
+
+        Статус пишется одним UPDATE ... FROM (VALUES ...) на окно, сообщение
+        подтверждается только после коммита этого UPDATE.
+        """
+        self._outcomes.append((review_id, status, message))
+        if len(self._outcomes) >= self.FLUSH_MAX_ITEMS:
+            try:
+                await self.flush_outcomes()
+            except Exception as e:
+                # Итоги остались в буфере и уйдут при следующем сбросе
+                logger.error(f"Ошибка сброса статусов отзывов: {str(e)}")
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_timer is None or self._flush_timer.done():
+            self._flush_timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            try:
+                await self.flush_outcomes()
+                return
+            except Exception as e:
+                logger.error(f"Ошибка отложенного сброса статусов отзывов: {str(e)}")
+
+    async def flush_outcomes(self) -> int:
+        """Сбрасывает накопленные статусы одной транзакцией, затем подтверждает сообщения"""
+        async with self._flush_lock:
+            outcomes, self._outcomes = self._outcomes, []
+            lines, self._response_log = self._response_log, []
+            if lines:
+                self._write_server_responses(lines)
+            if not outcomes:
+                return 0
+
+            # Для повторяющегося review_id побеждает последний статус
+            statuses = {review_id: status for review_id, status, _ in outcomes}
+            rows = values(
+                column('id', String), column('status', String), name='v'
+            ).data(list(statuses.items()))
+
+            async with self.session_maker() as db:
+                try:
+                    await db.execute(
+                        update(Review)
+                        .where(Review.id == rows.c.id)
+                        .values(status=rows.c.status)
+                    )
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    # Сообщения не подтверждены: возвращаем итоги в буфер, а не в очередь,
+                    # иначе повторная доставка отправит ответ ещё раз
+                    self._outcomes = outcomes + self._outcomes
+                    raise
+
+            for review_id, status, message in outcomes:
+                if message is None:
+                    continue
+                try:
+                    await message.ack()
+                    logger.info(f"Отзыв {review_id} обработан, статус {status}")
+                except Exception as e:
+                    logger.error(f"Ошибка подтверждения сообщения отзыва {review_id}: {str(e)}")
+
+            logger.debug(f"Сброшено статусов отзывов: {len(statuses)}")
+            return len(statuses)
+
+    def _retry_queue_name(self, delay: int) -> str:
+        # В имени весь набор аргументов очереди (TTL в мс и куда уходят просроченные),
+        # поэтому смена настроек объявляет новую очередь, а не ловит PRECONDITION_FAILED
+        return f"{self.QUEUE_NAME}.retry.ttl{delay * 1000}.dlx.{self.QUEUE_NAME}"
+
+    async def _declare_retry_topology(self):
+        """
+        Объявляет очереди отложенных повторов (TTL + dead-letter обратно в основную) и парковку.
+
+        Очереди прежних настроек (и старые имена вида reviews_ozon.retry.5s) сами
+        возвращают сообщения в основную по истечении TTL. Когда они опустеют, их
+        удаляют вручную: rabbitmqctl delete_queue <имя> --if-empty.
+        """
+        for delay in self.RETRY_DELAYS:
+            await self._channel.declare_queue(
+                self._retry_queue_name(delay),
+                durable=True,
+                arguments={
+                    'x-message-ttl': delay * 1000,
+                    'x-dead-letter-exchange': '',
+                    'x-dead-letter-routing-key': self.QUEUE_NAME,
+                }
             )
-            db.commit()
-            logger.info(f"Статус отзыва {review_id} изменен на {status}")
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Ошибка обновления статуса: {str(e)}")
-            raise
-
-    def process_message(self, ch: BlockingChannel, method, properties, body):
+        await self._channel.declare_queue(self.PARKING_QUEUE_NAME, durable=True)
+
+    async def _schedule_retry(
+            self,
+            message: AbstractIncomingMessage,
+            review_id: Optional[str],
+            reason: str,
+            posted: bool = False,
+            permanent: bool = False
+    ):
+        """Перекладывает сообщение в очередь повтора следующего уровня или в парковку и подтверждает оригинал"""
+        message_headers = dict(message.headers or {})
+        retry_count = int(message_headers.get('x-retry-count', 0))
+        message_headers['x-retry-count'] = retry_count + 1
+        message_headers['x-last-error'] = reason[:500]
+        if posted:
+            message_headers['x-posted'] = True
+
+        if not permanent and retry_count < len(self.RETRY_DELAYS):
+            delay = self.RETRY_DELAYS[retry_count]
+            target = self._retry_queue_name(delay)
+            logger.warning(
+                f"Отзыв {review_id}: попытка {retry_count + 1} не удалась, повтор через {delay} сек ({reason})")
+        else:
+            target = self.PARKING_QUEUE_NAME
+            logger.error(f"Отзыв {review_id} отправлен в {target} после {retry_count + 1} попыток: {reason}")
+            if review_id:
+                await self.complete_review(review_id, "InQueueError")
+
+        await self._channel.default_exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                headers=message_headers,
+                content_type=message.content_type,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+            ),
+            routing_key=target
+        )
+        await message.ack()
+
+    async def process_message(self, message: AbstractIncomingMessage):
         """Обрабатывает сообщение из очереди"""
-        db = None
+        review_id = None
+        client_id = None
+        # Ответ уже есть в Ozon (отправлен сейчас или в прошлой попытке): сообщение
+        # больше нельзя возвращать в очередь без отметки x-posted
+        posted = bool((message.headers or {}).get('x-posted'))
+        is_premium_plus = False
+        api_response: Dict[str, Any] = {'result': True}
         try:
-            message = json.loads(body)
-            review_id = message.get("review_id")
-            response_text = message.get("response_text")
-            client_id = message.get("client_id")
+            payload = json.loads(message.body)
+            review_id = payload.get("review_id")
+            response_text = payload.get("response_text")
+            client_id = payload.get("client_id")
 
             if not all([review_id, response_text, client_id]):
-                raise ValueError("Не хватает review_id, response_text или client_id в сообщении")
+                await self._schedule_retry(
+                    message, review_id, "Не хватает review_id, response_text или client_id в сообщении",
+                    permanent=True
+                )
+                return
 
-            db = next(get_db())
-            is_premium_plus = self.check_premium_plus(db, client_id)
+            is_premium_plus = await self.check_premium_plus(client_id)
 
             if is_premium_plus:
-                api_response = self.send_to_ozon_api(review_id, response_text, client_id)
-                success = 'comment_id' in api_response
-            else:
-                api_response = self.send_to_ozon_direct(review_id, response_text, client_id)
-                success = api_response.get('result', False)
-
-            if success:
-                self.update_review_status(db, review_id, "PROCESSED")
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                logger.info(f"Успешно обработан отзыв {review_id}")
-            else:
-                self.update_review_status(db, review_id, "InQueueError")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-                logger.error(f"Ошибка обработки отзыва {review_id}. Ответ API: {api_response}")
+                # Через API ответ создаётся сразу обработанным, сверка не нужна
+                if not posted:
+                    api_response = await self.send_to_ozon_api(review_id, response_text, client_id)
+                    if 'comment_id' not in api_response:
+                        await self._schedule_retry(message, review_id, str(api_response.get('error', api_response)))
+                        return
+                    posted = True
+                await self.complete_review(review_id, "PROCESSED", message)
+                return
+
+            # Сообщение вернулось от брокера без x-posted (например, после обрыва соединения):
+            # ответ мог уйти в прошлой доставке, поэтому сначала проверяем статус отзыва
+            if not posted and message.redelivered and await self._check_reply_detail(client_id, review_id):
+                posted = True
+
+            # Ответ через seller-UI уже отправлен в прошлой попытке - только повторная сверка
+            if not posted:
+                api_response = await self.send_to_ozon_direct(review_id, response_text, client_id)
+                if not api_response.get('result', False):
+                    await self._schedule_retry(message, review_id, str(api_response.get('error', api_response)))
+                    return
+                posted = True
+
+            # Сообщение подтверждается (ack) после пакетной сверки в verify_pending_replies
+            self._add_pending_reply(client_id, review_id, PendingReply(message, review_id, api_response))
 
         except json.JSONDecodeError as e:
             logger.error(f"Невалидный JSON в сообщении: {str(e)}")
-            if db and 'review_id' in locals():
-                self.update_review_status(db, review_id, "InQueueError")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            await self._schedule_retry(message, None, f"Невалидный JSON: {e}", permanent=True)
         except Exception as e:
             logger.error(f"Ошибка обработки сообщения: {str(e)}")
-            if db and 'review_id' in locals():
-                self.update_review_status(db, review_id, "InQueueError")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-        finally:
-            if db:
-                db.close()
-
-    def _run_consumer(self):
-        """Основной цикл consumer'а"""
+            try:
+                await self._schedule_retry(message, review_id, str(e), posted=posted)
+            except Exception as publish_error:
+                logger.error(f"Ошибка публикации в очередь повтора: {publish_error}")
+                if not posted:
+                    # Ответ в Ozon не отправлялся - сообщение можно вернуть брокеру
+                    await message.nack(requeue=True)
+                elif is_premium_plus:
+                    await self.complete_review(review_id, "PROCESSED", message)
+                else:
+                    # Ответ уже отправлен: сообщение остаётся без ack и ждёт сверки
+                    self._add_pending_reply(client_id, review_id, PendingReply(message, review_id, api_response))
+
+    @staticmethod
+    def _tenant_of(message: AbstractIncomingMessage) -> str:
+        """Клиент сообщения: заголовок x-client-id, иначе client_id из тела"""
+        client_id = (message.headers or {}).get('x-client-id')
+        if client_id:
+            return str(client_id)
         try:
-            self._connection = pika.BlockingConnection(
-                pika.ConnectionParameters(host=self.RABBITMQ_HOST, port=self.RABBITMQ_PORT,
-                                         credentials=pika.PlainCredentials(self.RABBITMQ_USERNAME, self.RABBITMQ_PASSWORD))
-            )
-            self._channel = self._connection.channel()
-            self._channel.queue_declare(queue=self.QUEUE_NAME, durable=True)
-            self._channel.basic_qos(prefetch_count=1)
-
-            self._channel.basic_consume(
-                queue=self.QUEUE_NAME,
-                on_message_callback=self.process_message,
-                auto_ack=False
-            )
-
-            logger.info(f"Consumer запущен для очереди {self.QUEUE_NAME}")
-            while self._running:
-                self._connection.process_data_events(time_limit=1)
-
-        except Exception as e:
-            logger.error(f"Ошибка в consumer: {str(e)}")
-        finally:
-            if self._connection and self._connection.is_open:
-                self._connection.close()
-
-    def start(self):
-        """Запускает consumer в отдельном потоке"""
+            return str(json.loads(message.body).get("client_id") or "")
+        except (ValueError, AttributeError):
+            return ""
+
+    async def _on_message(self, message: AbstractIncomingMessage):
+        """Колбэк aio-pika: раскладывает сообщение в очередь его клиента"""
+        tenant = self._tenant_of(message)
+        self._tenant_queues.setdefault(tenant, deque()).append(message)
+        if tenant not in self._scheduled_tenants:
+            self._scheduled_tenants.add(tenant)
+            self._ready_tenants.put_nowait(tenant)
+
+    async def _worker(self):
+        """
+        Берёт следующего клиента по кругу и обрабатывает одно его сообщение.
+
+        Клиент одновременно обрабатывается только одним воркером (порядок внутри
+        клиента сохраняется), после сообщения он встаёт в конец круга, поэтому
+        клиент с большой очередью или сломанными cookies не задерживает остальных.
+        У каждого клиента своя очередь в брокере со своим prefetch, поэтому клиент
+        с большим бэклогом не вытесняет сообщения остальных из prefetch.
+        """
+        while True:
+            tenant = await self._ready_tenants.get()
+            try:
+                queue = self._tenant_queues[tenant]
+                await self.process_message(queue.popleft())
+            except Exception as e:
+                logger.error(f"Ошибка воркера клиента {tenant}: {str(e)}")
+            finally:
+                if self._tenant_queues.get(tenant):
+                    self._ready_tenants.put_nowait(tenant)
+                else:
+                    self._tenant_queues.pop(tenant, None)
+                    self._scheduled_tenants.discard(tenant)
+                self._ready_tenants.task_done()
+
+    async def start(self):
+        """Подключается к RabbitMQ и начинает потреблять очередь в текущем event loop"""
         if self._running:
             logger.warning("Consumer уже запущен")
             return
 
+        self._ready_tenants = asyncio.Queue()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.MAX_CONCURRENCY)]
+        self._connection = await aio_pika.connect_robust(
+            host=self.RABBITMQ_HOST,
+            port=self.RABBITMQ_PORT,
+            login=self.RABBITMQ_USERNAME,
+            password=self.RABBITMQ_PASSWORD
+        )
+        self._channel = await self._connection.channel()
+        # prefetch без global действует на каждого потребителя, то есть на каждую очередь
+        await self._channel.set_qos(prefetch_count=self.PREFETCH_COUNT)
+        exchange = await declare_tenant_exchange(self._channel)
+        await self._declare_retry_topology()
+
+        # Общая очередь: клиенты без своей очереди, повторы из очередей TTL и старые сообщения
+        queues = [await self._channel.declare_queue(self.QUEUE_NAME, durable=True)]
+        for client_id in await self._load_tenants():
+            queues.append(await declare_tenant_queue(self._channel, exchange, client_id))
+        for queue in queues:
+            self._consumers.append((queue, await queue.consume(self._on_message, no_ack=False)))
+        self._verify_task = asyncio.ensure_future(self._verify_loop())
+
         self._running = True
-        self._thread = threading.Thread(target=self._run_consumer, daemon=True)
-        self._thread.start()
-        logger.info("Consumer запущен в фоновом режиме")
+        logger.info(
+            f"Consumer запущен: общая очередь {self.QUEUE_NAME} и {len(queues) - 1} очередей клиентов "
+            f"(prefetch на очередь={self.PREFETCH_COUNT}, воркеров={self.MAX_CONCURRENCY})"
+        )
+
+    async def _load_tenants(self) -> List[str]:
+        """Клиенты, для которых объявляются отдельные очереди (новые появятся при перезапуске consumer)"""
+        async with self.session_maker() as db:
+            rows = await db.execute(
+                select(ApiKeys.OZON_CLIENT_ID).where(ApiKeys.OZON_CLIENT_ID.isnot(None)).distinct()
+            )
+        return [str(client_id) for client_id in rows.scalars().all() if client_id]
 
-    def stop(self):
-        """Останавливает consumer"""
+    async def stop(self):
+        """Останавливает consumer, дожидаясь обработки уже полученных сообщений"""
         if not self._running:
             return
 
         self._running = False
-        if self._thread:
-            self._thread.join(timeout=5)
-        logger.info("Consumer остановлен")
\ No newline at end of file
+        try:
+            for queue, consumer_tag in self._consumers:
+                await queue.cancel(consumer_tag)
+            self._consumers = []
+            if self._ready_tenants:
+                try:
+                    await asyncio.wait_for(self._ready_tenants.join(), timeout=30)
+                except asyncio.TimeoutError:
+                    logger.warning("Не все полученные сообщения обработаны до остановки")
+            for worker in self._workers:
+                worker.cancel()
+            if self._verify_task:
+                self._verify_task.cancel()
+            # Последняя сверка, чтобы не оставлять отправленные ответы без ack
+            await self.verify_pending_replies()
+            if self._flush_timer and not self._flush_timer.done():
+                self._flush_timer.cancel()
+            await self.flush_outcomes()
+        finally:
+            await self._close_http_clients()
+            if self._connection and not self._connection.is_closed:
+                await self._connection.close()
+        logger.info("Consumer остановлен")
@@ -1,10 +1,11 @@
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Mapping
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import aiohttp
 import asyncio
 from src.models import Review, ProductPrompt, ProductInfo, Photo, Video, ApiKeys
+from src.parcer.sku_stats import add_review_to_sku_stats
 from src.utils.logger import get_logger
 from src.config import headers
 import dateutil.parser
@@ -81,11 +82,12 @@ async def save_pagination_data(db: AsyncSession, seller_id: str, last_id: str, t
     logger.debug(f"Updated pagination data for client {seller_id}")
 
 
-async def make_ozon_seller_request(url: str, payload: Dict[str, Any], cookies: Dict[str, str], max_retries: int = 3) -> \
+async def make_ozon_seller_request(url: str, payload: Dict[str, Any], cookies: Dict[str, str], max_retries: int = 3,
+                                   request_headers: Optional[Mapping[str, Any]] = None) -> \
 Optional[Dict[str, Any]]:
     for attempt in range(max_retries):
         try:
-            async with aiohttp.ClientSession(cookies=cookies, headers=headers) as session:
+            async with aiohttp.ClientSession(cookies=cookies, headers=request_headers or headers) as session:
                 async with session.post(url, json=payload, timeout=30) as response:
                     if response.status != 200:
                         error_data = await response.json()
@@ -180,6 +182,15 @@ async def save_review_data(db: AsyncSession, review_data: Dict[str, Any], seller
                        if k != 'url' and hasattr(model, k)}
                 ))
 
+        await add_review_to_sku_stats(
+            db,
+            sku=int(review_data['sku']),
+            published_at=published_at,
+            rating=review_data['rating'],
+            has_photos=bool(review_data.get('photo')),
+            has_videos=bool(review_data.get('video'))
+        )
+
         return True
 
     except Exception as e:
@@ -219,7 +230,8 @@ async def fetch_from_json(api_keys_dict: Dict[str, str], db: AsyncSession) -> Di
                     cookies_dict[key_name] = value
 
             cookies_dict['sc_company_id'] = seller_id
-            headers['x-o3-company-id'] = seller_id
+            # Собственная копия заголовков: общий словарь не меняем, ключи обрабатываются параллельно
+            seller_headers = {**headers, 'x-o3-company-id': seller_id}
 
             url = 'https://seller.ozon.ru/api/v3/review/list'
             payload = {
@@ -240,7 +252,7 @@ async def fetch_from_json(api_keys_dict: Dict[str, str], db: AsyncSession) -> Di
             if timestump:
                 payload['pagination_last_timestamp'] = timestump
 
-            response = await make_ozon_seller_request(url, payload, cookies_dict)
+            response = await make_ozon_seller_request(url, payload, cookies_dict, request_headers=seller_headers)
 
             if response is None or 'error' in response:
                 error_msg = response.get('error', {}).get('message', 'Unknown error') if response else 'No response'
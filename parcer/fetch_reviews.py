@@ -14,6 +14,7 @@ from src.database import async_session
 from src.models import (
     Review, ProductPrompt, ProductInfo, Comment, Photo, Video, ApiKeys, LogsNeuro
 )
+from src.parcer.sku_stats import add_review_to_sku_stats
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -213,6 +214,15 @@ async def save_review_data(db: AsyncSession, review_data: Dict[str, Any], api_ke
 
             await save_comments_and_media(db, review_data)
 
+            await add_review_to_sku_stats(
+                db,
+                sku=review_data['sku'],
+                published_at=review_data['published_at'],
+                rating=review_data['rating'],
+                has_photos=bool(review_data.get('photos')),
+                has_videos=bool(review_data.get('videos'))
+            )
+
         await db.commit()
     except Exception as e:
         await db.rollback()
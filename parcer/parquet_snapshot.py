@@ -0,0 +1,208 @@
+# src/parcer/parquet_snapshot.py
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, tuple_, literal, func, String, Integer, DateTime
+from sqlalchemy.orm import Session
+
+from src.database import run_in_sync_session
+from src.models import Review, NeuralResponse
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_DIR = os.getenv('PARQUET_SNAPSHOT_DIR', '')
+SNAPSHOT_INTERVAL = int(os.getenv('PARQUET_SNAPSHOT_INTERVAL', '3600'))
+# Строки моложе lag не выгружаются: updated_at = now() - время начала транзакции,
+# и транзакция, которая ещё не закоммичена, могла бы оказаться позади водяного знака
+SNAPSHOT_LAG = int(os.getenv('PARQUET_SNAPSHOT_LAG', '600'))
+SNAPSHOT_BATCH_SIZE = int(os.getenv('PARQUET_SNAPSHOT_BATCH_SIZE', '50000'))
+
+MANIFEST_NAME = 'manifest.json'
+
+UTC_TIMESTAMP = pa.timestamp('us', tz='UTC')
+
+# Выгружаемые таблицы: колонки, тип ключа водяного знака и схема Parquet
+SNAPSHOT_TABLES = {
+    'reviews': {
+        'model': Review,
+        'key_type': String(),
+        'schema': pa.schema([
+            ('id', pa.string()),
+            ('client_id', pa.string()),
+            ('sku', pa.int64()),
+            ('text', pa.string()),
+            ('rating', pa.int32()),
+            ('status', pa.string()),
+            ('published_at', UTC_TIMESTAMP),
+            ('order_status', pa.string()),
+            ('is_rating_participant', pa.bool_()),
+            ('updated_at', UTC_TIMESTAMP),
+        ]),
+    },
+    'neural_responses': {
+        'model': NeuralResponse,
+        'key_type': Integer(),
+        'schema': pa.schema([
+            ('id', pa.int64()),
+            ('review_id', pa.string()),
+            ('response_text', pa.string()),
+            ('created_at', pa.string()),
+            ('updated_at', UTC_TIMESTAMP),
+        ]),
+    },
+}
+
+
+def load_manifest(snapshot_dir: str) -> Dict[str, Any]:
+    path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'tables': {}, 'files': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(snapshot_dir: str, manifest: Dict[str, Any]) -> None:
+    """Атомарная запись манифеста: файлы, которых в нём нет, читателям не видны"""
+    path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def write_partitions(
+        snapshot_dir: str,
+        table_name: str,
+        schema: pa.Schema,
+        rows: List[Dict[str, Any]],
+        run_id: str,
+        part: int
+) -> List[Dict[str, Any]]:
+    """Пишет пачку строк в партиции table/date=YYYY-MM-DD по дате updated_at, возвращает записи манифеста"""
+    by_date: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_date.setdefault(row['updated_at'].astimezone(timezone.utc).strftime('%Y-%m-%d'), []).append(row)
+
+    files = []
+    for date, date_rows in sorted(by_date.items()):
+        rel_path = os.path.join(table_name, f'date={date}', f'part-{run_id}-{part:05d}.parquet')
+        path = os.path.join(snapshot_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        pq.write_table(
+            pa.Table.from_pylist(date_rows, schema=schema),
+            path + '.tmp',
+            compression='zstd'
+        )
+        os.replace(path + '.tmp', path)
+
+        files.append({
+            'table': table_name,
+            'path': rel_path,
+            'rows': len(date_rows),
+            'min_updated_at': min(r['updated_at'] for r in date_rows).isoformat(),
+            'max_updated_at': max(r['updated_at'] for r in date_rows).isoformat(),
+            'run_id': run_id,
+        })
+    return files
+
+
+def export_table(
+        db: Session,
+        snapshot_dir: str,
+        manifest: Dict[str, Any],
+        table_name: str,
+        cutoff: datetime,
+        run_id: str,
+        batch_size: int = SNAPSHOT_BATCH_SIZE
+) -> int:
+    """
+    Выгружает строки таблицы, изменённые после водяного знака (updated_at, id).
+
+    Строки читаются серверным курсором в порядке (updated_at, id) пачками по
+    batch_size; после каждой пачки файлы и новый водяной знак фиксируются
+    в манифесте, так что прерванная выгрузка продолжается с последней пачки.
+    """
+    config = SNAPSHOT_TABLES[table_name]
+    model = config['model']
+    schema = config['schema']
+    columns = [getattr(model, name) for name in schema.names]
+
+    query = (
+        select(*columns)
+        .where(model.updated_at < cutoff)
+        .order_by(model.updated_at, model.id)
+        .execution_options(yield_per=batch_size)
+    )
+    state = manifest['tables'].get(table_name)
+    if state:
+        bound = tuple_(
+            literal(datetime.fromisoformat(state['updated_at']), DateTime(timezone=True)),
+            literal(state['id'], config['key_type'])
+        )
+        query = query.where(tuple_(model.updated_at, model.id) > bound)
+
+    exported = 0
+    for part, batch in enumerate(db.execute(query).partitions()):
+        rows = [dict(row._mapping) for row in batch]
+        for row in rows:
+            row['updated_at'] = as_utc(row['updated_at'])
+            if 'published_at' in row:
+                row['published_at'] = as_utc(row['published_at'])
+
+        manifest['files'].extend(write_partitions(snapshot_dir, table_name, schema, rows, run_id, part))
+        last = rows[-1]
+        manifest['tables'][table_name] = {'updated_at': last['updated_at'].isoformat(), 'id': last['id']}
+        save_manifest(snapshot_dir, manifest)
+        exported += len(rows)
+
+    return exported
+
+
+def export_snapshots(db: Session, snapshot_dir: str = SNAPSHOT_DIR, lag: int = SNAPSHOT_LAG) -> Dict[str, int]:
+    """
+    Инкрементальный снимок reviews и neural_responses в Parquet.
+
+    Одна строка может попасть в несколько файлов (по разу на каждое
+    изменение): актуальная версия - с наибольшим updated_at для id.
+    Читать нужно только файлы из манифеста.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = load_manifest(snapshot_dir)
+    cutoff = db.scalar(select(func.now())) - timedelta(seconds=lag)
+    run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+
+    exported = {}
+    for table_name in SNAPSHOT_TABLES:
+        exported[table_name] = export_table(db, snapshot_dir, manifest, table_name, cutoff, run_id)
+        # Длинный снимок не должен держать одну транзакцию на обе таблицы
+        db.commit()
+
+    manifest['last_run'] = {'run_id': run_id, 'cutoff': cutoff.isoformat(), 'rows': exported}
+    save_manifest(snapshot_dir, manifest)
+    return exported
+
+
+async def run_parquet_snapshots(snapshot_dir: str = SNAPSHOT_DIR, interval: int = SNAPSHOT_INTERVAL):
+    """Фоновый цикл снимков для планировщика; pyarrow и курсор работают в пуле потоков"""
+    while True:
+        try:
+            exported = await run_in_sync_session(lambda db: export_snapshots(db, snapshot_dir))
+            logger.info(f"Parquet-снимок: {exported}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка Parquet-снимка: {str(e)}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,71 @@
+# src/parcer/review_counters.py
+import asyncio
+import os
+
+from sqlalchemy import text
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+REPAIR_INTERVAL = int(os.getenv('REVIEW_COUNTERS_REPAIR_INTERVAL', '3600'))
+
+# Пересчёт по тем же правилам, что и начальное заполнение в миграции; строки,
+# совпадающие с фактом, не трогаются, лишние (клиент/статус без отзывов) удаляются
+RECOUNT_SQL = text("""
+    WITH actual AS (
+        SELECT coalesce(v.client_id, '') AS client_id, coalesce(v.status, '') AS status,
+               count(*) AS reviews, count(r.id) AS with_response
+        FROM reviews v LEFT JOIN neural_responses r ON r.review_id = v.id
+        GROUP BY 1, 2
+    ), fixed AS (
+        INSERT INTO review_counters (client_id, status, reviews, with_response)
+        SELECT client_id, status, reviews, with_response FROM actual
+        ON CONFLICT (client_id, status) DO UPDATE SET
+            reviews = EXCLUDED.reviews,
+            with_response = EXCLUDED.with_response
+        WHERE (review_counters.reviews, review_counters.with_response)
+            IS DISTINCT FROM (EXCLUDED.reviews, EXCLUDED.with_response)
+        RETURNING 1
+    ), removed AS (
+        DELETE FROM review_counters c
+        WHERE NOT EXISTS (SELECT 1 FROM actual a WHERE a.client_id = c.client_id AND a.status = c.status)
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM fixed) + (SELECT count(*) FROM removed)
+""")
+
+
+async def repair_review_counters(session_maker) -> int:
+    """
+    Пересчитывает review_counters по reviews и neural_responses, возвращает число исправленных строк.
+
+    Триггеры ведут счётчики приращениями, и любое расхождение (ручная правка,
+    TRUNCATE, сбой до создания триггеров) иначе осталось бы навсегда. Таблица
+    счётчиков блокируется от записи на время пересчёта: транзакции, уже
+    изменившие счётчики, успевают закоммититься и попадают в пересчёт, а
+    остальные применят свои приращения после него.
+    """
+    async with session_maker() as session:
+        try:
+            await session.execute(text("LOCK TABLE review_counters IN SHARE ROW EXCLUSIVE MODE"))
+            repaired = (await session.execute(RECOUNT_SQL)).scalar_one()
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+    return repaired
+
+
+async def run_review_counters_repair(session_maker, interval: int = REPAIR_INTERVAL):
+    """Фоновый цикл сверки счётчиков для планировщика"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            repaired = await repair_review_counters(session_maker)
+            if repaired:
+                logger.warning(f"review_counters: исправлено расхождений: {repaired}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка сверки review_counters: {str(e)}", exc_info=True)
@@ -12,10 +12,14 @@ from src.models import ApiKeys, Log
 from src.config import SCHEDULE_INTERVAL
 from src.parcer.fetch_reviews import fetch_and_save_reviews
 from src.parcer.fetch_from_json import fetch_from_json
-from src.neural.neural_network import ReviewProcessor
+from src.neural.neural_network import create_review_processor, close_review_processors
 from src.utils.logger import get_logger
 from src.parcer.consumer_module import OzonConsumer
 from src.rabbitmq_scripts.auto_send import send_filtered_reviews
+from src.rabbitmq_scripts.outbox_relay import run_outbox_relay
+from src.parcer.parquet_snapshot import run_parquet_snapshots, SNAPSHOT_DIR
+from src.parcer.review_counters import run_review_counters_repair
+from src.parcer.sku_stats import run_sku_stats_rebuild
 
 logger = get_logger(__name__)
 
@@ -24,11 +28,11 @@ class AsyncScheduler:
     def __init__(self, session_maker):
         self.active_tasks = set()
         self.session_maker = session_maker
-        self.consumer = OzonConsumer()
+        self.consumer = OzonConsumer(self.session_maker)
         self._running = False
         self._fetch_json_counter = {}
-        # Инициализируем процессор отзывов с фабрикой сессий
-        self.review_processor = ReviewProcessor(session_maker)
+        # Общий процессор отзывов фабрики сессий (один буфер записи на процесс)
+        self.review_processor = create_review_processor(session_maker)
 
     async def log_to_db(self, status: str, message: str):
         """Запись логов в базу данных"""
@@ -170,6 +174,18 @@ class AsyncScheduler:
                 else:
                     logger.warning("consumer.start() не является корутиной, пропускаем await")
 
+            # Relay outbox переносит сообщения в RabbitMQ независимо от основного цикла
+            self.active_tasks.add(asyncio.create_task(run_outbox_relay(self.session_maker)))
+
+            # Периодическая сверка счётчиков, которые триггеры ведут приращениями
+            self.active_tasks.add(asyncio.create_task(run_review_counters_repair(self.session_maker)))
+            # Дневная сводка SKU пополняется при сохранении, правки и удаления отзывов - пересчётом
+            self.active_tasks.add(asyncio.create_task(run_sku_stats_rebuild(self.session_maker)))
+
+            # Parquet-снимки для аналитики включаются каталогом PARQUET_SNAPSHOT_DIR
+            if SNAPSHOT_DIR:
+                self.active_tasks.add(asyncio.create_task(run_parquet_snapshots()))
+
             while self._running:
                 try:
                     # Проверяем, нужно ли обновить consumer (каждые 30 минут)
@@ -187,7 +203,7 @@ class AsyncScheduler:
                                 logger.error(f"Ошибка остановки consumer: {str(e)}")
 
                         # Затем создаем новый экземпляр и запускаем его
-                        self.consumer = OzonConsumer()
+                        self.consumer = OzonConsumer(self.session_maker)
                         if hasattr(self.consumer, 'start'):
                             start_result = self.consumer.start()
                             if asyncio.iscoroutine(start_result):
@@ -228,7 +244,7 @@ class AsyncScheduler:
                 task.cancel()
                 try:
                     await task
-                except Exception:
+                except (Exception, asyncio.CancelledError):
                     pass
 
         # Остановка consumer
@@ -240,6 +256,9 @@ class AsyncScheduler:
             except Exception as e:
                 logger.error(f"Ошибка остановки consumer: {str(e)}")
 
+        # Сброс буферизованных ответов, чтобы не потерять их и не держать аренды до истечения
+        await close_review_processors()
+
         # Фиксация завершения работы
         try:
             await self.log_to_db(
@@ -0,0 +1,146 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, cast, func, literal, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import SkuDailyStats
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+REBUILD_INTERVAL = int(os.getenv('SKU_STATS_REBUILD_INTERVAL', '3600'))
+
+# Счётчики строки sku_daily_stats, которые суммируются при upsert
+COUNTER_COLUMNS = (
+    'reviews', 'rated', 'rating_sum',
+    'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    'with_photos', 'with_videos',
+)
+
+
+# Пересчёт сводки по отзывам (как начальное заполнение в миграции): строки,
+# совпадающие с фактом, не трогаются, дни без отзывов удаляются
+REBUILD_SQL = text("""
+    WITH actual AS (
+        SELECT
+            p.sku,
+            date(r.published_at) AS day,
+            count(*) AS reviews,
+            count(r.rating) AS rated,
+            coalesce(sum(r.rating), 0) AS rating_sum,
+            count(*) FILTER (WHERE r.rating = 1) AS rating_1,
+            count(*) FILTER (WHERE r.rating = 2) AS rating_2,
+            count(*) FILTER (WHERE r.rating = 3) AS rating_3,
+            count(*) FILTER (WHERE r.rating = 4) AS rating_4,
+            count(*) FILTER (WHERE r.rating = 5) AS rating_5,
+            count(*) FILTER (WHERE EXISTS (SELECT 1 FROM photos ph WHERE ph.review_id = r.id)) AS with_photos,
+            count(*) FILTER (WHERE EXISTS (SELECT 1 FROM videos v WHERE v.review_id = r.id)) AS with_videos
+        FROM reviews r
+        JOIN product_info p ON p.review_id = r.id
+        WHERE r.published_at IS NOT NULL AND p.sku IS NOT NULL
+        GROUP BY 1, 2
+    ), fixed AS (
+        INSERT INTO sku_daily_stats AS s (
+            sku, day, reviews, rated, rating_sum,
+            rating_1, rating_2, rating_3, rating_4, rating_5,
+            with_photos, with_videos
+        )
+        SELECT * FROM actual
+        ON CONFLICT (sku, day) DO UPDATE SET
+            reviews = EXCLUDED.reviews, rated = EXCLUDED.rated, rating_sum = EXCLUDED.rating_sum,
+            rating_1 = EXCLUDED.rating_1, rating_2 = EXCLUDED.rating_2, rating_3 = EXCLUDED.rating_3,
+            rating_4 = EXCLUDED.rating_4, rating_5 = EXCLUDED.rating_5,
+            with_photos = EXCLUDED.with_photos, with_videos = EXCLUDED.with_videos
+        WHERE (s.reviews, s.rated, s.rating_sum, s.rating_1, s.rating_2, s.rating_3,
+               s.rating_4, s.rating_5, s.with_photos, s.with_videos)
+            IS DISTINCT FROM (EXCLUDED.reviews, EXCLUDED.rated, EXCLUDED.rating_sum,
+                              EXCLUDED.rating_1, EXCLUDED.rating_2, EXCLUDED.rating_3,
+                              EXCLUDED.rating_4, EXCLUDED.rating_5, EXCLUDED.with_photos, EXCLUDED.with_videos)
+        RETURNING 1
+    ), removed AS (
+        DELETE FROM sku_daily_stats s
+        WHERE NOT EXISTS (SELECT 1 FROM actual a WHERE a.sku = s.sku AND a.day = s.day)
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM fixed) + (SELECT count(*) FROM removed)
+""")
+
+
+def stats_day(published_at: datetime):
+    """
+    День отзыва в сводке: date(published_at) в часовом поясе сессии БД,
+    та же граница дня, что у func.date в отчёте до появления сводки
+    """
+    return func.date(cast(literal(published_at), DateTime(timezone=True)))
+
+
+async def add_review_to_sku_stats(
+        db: AsyncSession,
+        sku: int,
+        published_at: datetime,
+        rating: Optional[int],
+        has_photos: bool,
+        has_videos: bool
+) -> None:
+    """
+    Учитывает новый отзыв в sku_daily_stats.
+
+    Выполняется в той же транзакции, что и вставка отзыва: если сохранение
+    откатится, откатится и прибавка к сводке. Изменения и удаления отзывов
+    учитываются периодическим пересчётом rebuild_sku_stats.
+    """
+    values = {column: 0 for column in COUNTER_COLUMNS}
+    values.update(
+        reviews=1,
+        with_photos=int(has_photos),
+        with_videos=int(has_videos)
+    )
+    if rating is not None:
+        values['rated'] = 1
+        values['rating_sum'] = rating
+        if 1 <= rating <= 5:
+            values[f'rating_{rating}'] = 1
+
+    stmt = insert(SkuDailyStats).values(sku=sku, day=stats_day(published_at), **values)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=['sku', 'day'],
+        set_={column: getattr(SkuDailyStats, column) + stmt.excluded[column] for column in COUNTER_COLUMNS}
+    ))
+
+
+async def rebuild_sku_stats(session_maker) -> int:
+    """
+    Пересчитывает sku_daily_stats по отзывам, возвращает число исправленных строк.
+
+    Сводка пополняется только при сохранении отзыва, поэтому смена оценки,
+    даты или SKU и удаление отзывов попадают в неё этим пересчётом. На время
+    пересчёта сводка закрыта для записи: уже прибавившие строки транзакции
+    успевают закоммититься, остальные прибавят после пересчёта.
+    """
+    async with session_maker() as session:
+        try:
+            await session.execute(text("LOCK TABLE sku_daily_stats IN SHARE ROW EXCLUSIVE MODE"))
+            repaired = (await session.execute(REBUILD_SQL)).scalar_one()
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+    return repaired
+
+
+async def run_sku_stats_rebuild(session_maker, interval: int = REBUILD_INTERVAL):
+    """Фоновый цикл пересчёта дневной сводки для планировщика"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            repaired = await rebuild_sku_stats(session_maker)
+            if repaired:
+                logger.info(f"sku_daily_stats: пересчитано строк: {repaired}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка пересчёта sku_daily_stats: {str(e)}", exc_info=True)
@@ -1,35 +1,161 @@
+import asyncio
 import json
 import os
+from typing import Iterable, List, Optional
+
+import aio_pika
+
 from src.api.logger import logger
-import pika
-
-
-def send_to_rabbitmq(message: dict):
-    try:
-        # Настройки подключения к RabbitMQ
-        RABBITMQ_HOST = os.environ.get('RABBITMQ_HOST', '147.45.151.180')
-        RABBITMQ_PORT = int(os.environ.get('RABBITMQ_PORT', '5672'))
-        RABBITMQ_USERNAME = os.environ.get('RABBITMQ_USERNAME', 'admin')
-        RABBITMQ_PASSWORD = os.environ.get('RABBITMQ_PASSWORD', 'Valera_228')
-        
-        # Настройка параметров подключения
-        credentials = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
-        parameters = pika.ConnectionParameters(
-            host=RABBITMQ_HOST,
-            port=RABBITMQ_PORT,
-            credentials=credentials
-        )
-        
-        connection = pika.BlockingConnection(parameters)
-        channel = connection.channel()
-        channel.queue_declare(queue='reviews_ozon', durable=True)
-        channel.basic_publish(
-            exchange='',
-            routing_key='reviews_ozon',
-            body=json.dumps(message),
-            properties=pika.BasicProperties(delivery_mode=2))
-        connection.close()
-        return True
-    except Exception as e:
-        logger.error(f"RabbitMQ error: {e}")
-        return False
+
+# Настройки подключения к RabbitMQ
+RABBITMQ_HOST = os.environ.get('RABBITMQ_HOST', '147.45.151.180')
+RABBITMQ_PORT = int(os.environ.get('RABBITMQ_PORT', '5672'))
+RABBITMQ_USERNAME = os.environ.get('RABBITMQ_USERNAME', 'admin')
+RABBITMQ_PASSWORD = os.environ.get('RABBITMQ_PASSWORD', 'Valera_228')
+QUEUE_NAME = 'reviews_ozon'
+# Маршрутизация по клиентам на стороне брокера: direct-exchange по client_id в очередь
+# клиента reviews_ozon.tenant.<client_id>. Сообщения клиентов без своей очереди (новый
+# клиент, нет client_id) через alternate-exchange попадают в общую очередь reviews_ozon
+TENANT_EXCHANGE_NAME = f'{QUEUE_NAME}.tenants'
+UNROUTED_EXCHANGE_NAME = f'{QUEUE_NAME}.unrouted'
+
+# Размер пачки публикаций на одно ожидание подтверждений и ёмкость буфера издателя
+PUBLISH_BATCH_SIZE = int(os.environ.get('RABBITMQ_PUBLISH_BATCH_SIZE', '500'))
+PUBLISH_BUFFER_SIZE = int(os.environ.get('RABBITMQ_PUBLISH_BUFFER_SIZE', '5000'))
+
+
+def _message_headers(message: dict) -> dict:
+    # x-client-id позволяет consumer'у разложить сообщение по клиентам без разбора тела
+    client_id = message.get("client_id")
+    return {'x-client-id': str(client_id)} if client_id else {}
+
+
+def tenant_queue_name(client_id: str) -> str:
+    return f"{QUEUE_NAME}.tenant.{client_id}"
+
+
+async def declare_tenant_exchange(channel: aio_pika.abc.AbstractChannel) -> aio_pika.abc.AbstractExchange:
+    """Объявляет exchange клиентов и общую очередь для сообщений без очереди клиента"""
+    shared_queue = await channel.declare_queue(QUEUE_NAME, durable=True)
+    unrouted = await channel.declare_exchange(UNROUTED_EXCHANGE_NAME, aio_pika.ExchangeType.FANOUT, durable=True)
+    await shared_queue.bind(unrouted)
+    return await channel.declare_exchange(
+        TENANT_EXCHANGE_NAME,
+        aio_pika.ExchangeType.DIRECT,
+        durable=True,
+        arguments={'alternate-exchange': UNROUTED_EXCHANGE_NAME}
+    )
+
+
+async def declare_tenant_queue(
+        channel: aio_pika.abc.AbstractChannel,
+        exchange: aio_pika.abc.AbstractExchange,
+        client_id: str
+) -> aio_pika.abc.AbstractQueue:
+    """Объявляет очередь клиента и привязывает её к exchange по client_id"""
+    queue = await channel.declare_queue(tenant_queue_name(client_id), durable=True)
+    await queue.bind(exchange, routing_key=str(client_id))
+    return queue
+
+
+class AsyncRabbitMQPublisher:
+    """
+    Долгоживущий асинхронный издатель (aio-pika) с ограниченным буфером.
+
+    publish() кладёт сообщение в буфер (при переполнении ждёт - backpressure)
+    и возвращает результат после подтверждения брокером. Фоновая задача
+    выбирает из буфера до batch_size сообщений и публикует их разом в канал
+    с publisher confirms: подтверждения ожидаются пачкой, а не по одному.
+    Сообщения публикуются в exchange клиентов с routing key = client_id.
+    Переподключение выполняет connect_robust.
+    """
+
+    def __init__(
+            self,
+            batch_size: int = PUBLISH_BATCH_SIZE,
+            buffer_size: int = PUBLISH_BUFFER_SIZE
+    ):
+        self.batch_size = batch_size
+        self.loop = asyncio.get_running_loop()
+        self._buffer: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self._connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self._channel: Optional[aio_pika.abc.AbstractChannel] = None
+        self._exchange: Optional[aio_pika.abc.AbstractExchange] = None
+        self._connect_lock = asyncio.Lock()
+        self._sender: Optional[asyncio.Task] = None
+
+    async def _ensure_exchange(self) -> aio_pika.abc.AbstractExchange:
+        async with self._connect_lock:
+            if self._channel is None or self._channel.is_closed:
+                if self._connection is None or self._connection.is_closed:
+                    self._connection = await aio_pika.connect_robust(
+                        host=RABBITMQ_HOST,
+                        port=RABBITMQ_PORT,
+                        login=RABBITMQ_USERNAME,
+                        password=RABBITMQ_PASSWORD
+                    )
+                self._channel = await self._connection.channel(publisher_confirms=True)
+                self._exchange = await declare_tenant_exchange(self._channel)
+            return self._exchange
+
+    async def publish(self, message: dict) -> bool:
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.ensure_future(self._send_loop())
+        future = self.loop.create_future()
+        await self._buffer.put((message, future))
+        return await future
+
+    async def publish_many_results(self, messages: Iterable[dict]) -> List[bool]:
+        """Публикует сообщения, возвращает признак подтверждения брокером для каждого"""
+        return list(await asyncio.gather(*(self.publish(message) for message in messages)))
+
+    async def publish_many(self, messages: Iterable[dict]) -> int:
+        """Публикует сообщения, возвращает количество подтверждённых брокером"""
+        return sum(await self.publish_many_results(messages))
+
+    async def _send_loop(self):
+        while True:
+            batch = [await self._buffer.get()]
+            while len(batch) < self.batch_size and not self._buffer.empty():
+                batch.append(self._buffer.get_nowait())
+
+            try:
+                exchange = await self._ensure_exchange()
+                results = await asyncio.gather(*(
+                    exchange.publish(
+                        aio_pika.Message(
+                            body=json.dumps(message).encode(),
+                            headers=_message_headers(message),
+                            delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+                        ),
+                        routing_key=str(message.get("client_id") or "")
+                    )
+                    for message, _ in batch
+                ), return_exceptions=True)
+            except Exception as e:
+                logger.error(f"RabbitMQ error: {e}")
+                results = [e] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    logger.error(f"RabbitMQ publish error: {result}")
+                if not future.done():
+                    future.set_result(not isinstance(result, Exception))
+
+    async def close(self):
+        if self._sender and not self._sender.done():
+            self._sender.cancel()
+        if self._connection and not self._connection.is_closed:
+            await self._connection.close()
+
+
+_async_publisher: Optional[AsyncRabbitMQPublisher] = None
+
+
+def get_async_publisher() -> AsyncRabbitMQPublisher:
+    """Асинхронный издатель текущего event loop (создаётся при первом обращении)"""
+    global _async_publisher
+    if _async_publisher is None or _async_publisher.loop is not asyncio.get_running_loop():
+        _async_publisher = AsyncRabbitMQPublisher()
+    return _async_publisher
+
@@ -1,15 +1,19 @@
-import asyncio
-import logging
+import os
 from datetime import datetime
-from sqlalchemy import select, update, and_, or_
+from typing import Optional, Sequence
+
+from sqlalchemy import select, update, insert, and_, or_, true
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.models import Review, NeuralResponse, Log, ReviewFilter
-from src.rabbitmq_scripts.SendToRabbitMQ import send_to_rabbitmq
+from src.models import Review, NeuralResponse, Log, ReviewFilter, QueueOutbox
+from src.rabbitmq_scripts.outbox_relay import outbox_values
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Сколько отзывов забирается одним UPDATE ... RETURNING
+DISPATCH_BATCH_SIZE = int(os.getenv('DISPATCH_BATCH_SIZE', '1000'))
+
 
 def format_datetime(dt):
     """Форматируем datetime в строку для БД"""
@@ -26,130 +30,113 @@ async def get_active_filters(session: AsyncSession):
     return result.scalars().all()
 
 
-async def get_filtered_reviews(session: AsyncSession, filter):
-    """Получаем отзывы по фильтру"""
-    query = select(
-        Review,
-        NeuralResponse.response_text,
-        NeuralResponse.created_at
-    ).join(
-        NeuralResponse, Review.id == NeuralResponse.review_id
-    ).where(
-        Review.status == "UNPROCESSED",
-    )
+def filter_condition(filter):
+    """Условие одного фильтра (без проверки статуса)"""
+    conditions = []
 
     if filter.RATING is not None:
-        query = query.where(Review.rating == filter.RATING)
+        conditions.append(Review.rating == filter.RATING)
 
-    if filter.HAS_TEXT is not None:
-        if filter.HAS_TEXT:
-            query = query.where(and_(
-                Review.text.is_not(None),
-                Review.text != ""
-            ))
-        else:
-            query = query.where(or_(
-                Review.text.is_(None),
-                Review.text == ""
-            ))
+    if filter.HAS_TEXT is False:
+        conditions.append(or_(Review.text.is_(None), Review.text == ""))
+    elif filter.HAS_TEXT is True:
+        conditions.append(Review.text.is_not(None))
+        conditions.append(Review.text != "")
 
-    result = await session.execute(query)
-    return result.all()
+    return and_(*conditions) if conditions else true()
 
 
-async def send_review_to_queue(session: AsyncSession, review, response_text, created_at, filter_id):
-    try:
-        message = {
-            "review_id": review.id,
-            "review_text": review.text,
-            "response_text": response_text,
-            "created_at": format_datetime(created_at),
-            "client_id": review.client_id,
-            "filter_id": filter_id
-        }
-
-        logger.debug(f"Preparing to send message: {message}")
-
-        # Отправка в RabbitMQ
-        loop = asyncio.get_event_loop()
-        success = await loop.run_in_executor(None, send_to_rabbitmq, message)
-
-        if not success:
-            logger.error(f"Failed to send message for review {review.id}")
-            return False
-
-        # Обновляем статус отзыва
-        await session.execute(
-            update(Review)
-            .where(Review.id == review.id)
-            .values(status="InQueue")
-        )
-
-        # Логируем действие
-        log_entry = Log(
-            timestamp=datetime.now().isoformat(),
-            status="SENT_TO_QUEUE",
-            message=f"Review {review.id} sent via filter {filter_id}"
-        )
-        session.add(log_entry)
-
-        await session.commit()
-        logger.debug(f"Successfully processed review {review.id}")
-
-        return True
+def matching_filter_id(filters: Sequence, rating: Optional[int], text: Optional[str]) -> Optional[str]:
+    """id первого фильтра, под который попал отзыв (для сообщения и лога)"""
+    for filter in filters:
+        if filter.RATING is not None and rating != filter.RATING:
+            continue
+        if filter.HAS_TEXT is not None and bool(text) != filter.HAS_TEXT:
+            continue
+        return filter.id
+    return None
 
-    except Exception as e:
-        await session.rollback()
-        logger.error(f"Error sending review {review.id}: {str(e)}", exc_info=True)
-        return False
 
+async def send_filtered_reviews(session: AsyncSession, batch_size: int = DISPATCH_BATCH_SIZE):
+    """
+    Ставит в очередь все неотправленные отзывы, подходящие хотя бы под один активный фильтр.
 
-async def send_filtered_reviews(session: AsyncSession):
+    Фильтры собираются в одно условие (OR условий фильтров), отзывы забираются
+    пачками одним UPDATE ... SET status='InQueue' ... RETURNING, а сообщения и
+    логи пачки пишутся в outbox и logs в той же транзакции.
+    """
     try:
-        # Явный запрос фильтров
-        stmt = select(ReviewFilter).where(ReviewFilter.IS_ACTIVE == True)
-        result = await session.execute(stmt)
-        filters = result.scalars().all()
+        filters = await get_active_filters(session)
 
         if not filters:
             logger.debug("No active filters found")
             return 0
 
+        predicate = or_(*(filter_condition(filter) for filter in filters))
         total_sent = 0
 
-        for filter in filters:
-            # Правильное построение условий
-            conditions = [Review.status == "UNPROCESSED"]
-
-            if filter.RATING is not None:
-                conditions.append(Review.rating == filter.RATING)
-
-            if filter.HAS_TEXT is False:
-                conditions.append(or_(Review.text.is_(None), Review.text == ""))
-            elif filter.HAS_TEXT is True:
-                conditions.append(Review.text.is_not(None))
-                conditions.append(Review.text != "")
-
-            # Выполняем запрос
-            reviews_stmt = select(
-                Review,
-                NeuralResponse.response_text,
-                NeuralResponse.created_at
-            ).join(
-                NeuralResponse,
-                Review.id == NeuralResponse.review_id
-            ).where(*conditions)
-
-            reviews_result = await session.execute(reviews_stmt)
-            reviews = reviews_result.all()
-
-            for review, response_text, created_at in reviews:
-                if await send_review_to_queue(session, review, response_text, created_at, filter.id):
-                    total_sent += 1
+        while True:
+            # Отзывы пачки блокируются с SKIP LOCKED, чтобы параллельный запуск не забрал их повторно
+            batch_ids = (
+                select(Review.id)
+                .join(NeuralResponse, Review.id == NeuralResponse.review_id)
+                .where(Review.status == "UNPROCESSED", predicate)
+                .limit(batch_size)
+                .with_for_update(of=Review, skip_locked=True)
+                .scalar_subquery()
+            )
+
+            claimed = (await session.execute(
+                update(Review)
+                .where(Review.id.in_(batch_ids), Review.id == NeuralResponse.review_id)
+                .values(status="InQueue")
+                .returning(
+                    Review.id,
+                    Review.text,
+                    Review.rating,
+                    Review.client_id,
+                    NeuralResponse.response_text,
+                    NeuralResponse.created_at
+                )
+                .execution_options(synchronize_session=False)
+            )).all()
+
+            if not claimed:
+                await session.commit()
+                break
+
+            now = datetime.now().isoformat()
+            outbox_rows, log_rows = [], []
+            for row in claimed:
+                filter_id = matching_filter_id(filters, row.rating, row.text)
+                message = {
+                    "review_id": row.id,
+                    "review_text": row.text,
+                    "response_text": row.response_text,
+                    "created_at": format_datetime(row.created_at),
+                    "client_id": row.client_id,
+                    "filter_id": filter_id
+                }
+                outbox_rows.append(outbox_values(message))
+                log_rows.append({
+                    'timestamp': now,
+                    'status': "SENT_TO_QUEUE",
+                    'message': f"Review {row.id} sent via filter {filter_id}"
+                })
+
+            await session.execute(insert(QueueOutbox).values(outbox_rows))
+            await session.execute(insert(Log).values(log_rows))
+            await session.commit()
+
+            total_sent += len(claimed)
+            logger.debug(f"Claimed {len(claimed)} reviews for queue")
+            if len(claimed) < batch_size:
+                break
 
         logger.info(f"Sent {total_sent} reviews to queue")
         return total_sent
 
     except Exception as e:
+        await session.rollback()
         logger.error(f"Error in send_filtered_reviews: {str(e)}", exc_info=True)
-        raise  # Пробрасываем исключение выше
\ No newline at end of file
+        raise  # Пробрасываем исключение выше
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+
+from sqlalchemy import select, delete
+
+from src.models import QueueOutbox
+from src.rabbitmq_scripts.SendToRabbitMQ import get_async_publisher
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '1'))
+
+
+def outbox_values(message: dict) -> dict:
+    """Значения строки outbox для многострочного INSERT"""
+    return {'review_id': message["review_id"], 'payload': json.dumps(message)}
+
+
+def outbox_row(message: dict) -> QueueOutbox:
+    """Строка outbox для сообщения; добавляется в ту же транзакцию, что и смена статуса отзыва"""
+    return QueueOutbox(**outbox_values(message))
+
+
+async def relay_outbox(session_maker, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Переносит строки outbox в RabbitMQ пачками и удаляет подтверждённые брокером.
+
+    Пачка выбирается FOR UPDATE SKIP LOCKED, поэтому несколько relay не
+    отправят одну строку дважды. Если процесс упадёт между публикацией и
+    удалением, строка уйдёт повторно (доставка at-least-once).
+    """
+    total = 0
+    while True:
+        async with session_maker() as session:
+            rows = (await session.execute(
+                select(QueueOutbox.id, QueueOutbox.payload)
+                .order_by(QueueOutbox.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                await session.commit()
+                return total
+
+            results = await get_async_publisher().publish_many_results(
+                [json.loads(row.payload) for row in rows]
+            )
+            sent_ids = [row.id for row, ok in zip(rows, results) if ok]
+            if sent_ids:
+                await session.execute(delete(QueueOutbox).where(QueueOutbox.id.in_(sent_ids)))
+            await session.commit()
+
+        total += len(sent_ids)
+        logger.debug(f"Outbox: отправлено {len(sent_ids)} из {len(rows)} сообщений")
+        if len(sent_ids) < len(rows):
+            # Брокер недоступен - остаток уйдёт на следующем проходе
+            return total
+
+
+async def run_outbox_relay(session_maker, interval: float = OUTBOX_POLL_INTERVAL):
+    """Фоновый цикл relay для планировщика"""
+    while True:
+        try:
+            sent = await relay_outbox(session_maker)
+            if sent:
+                logger.info(f"Outbox: отправлено в очередь {sent} сообщений")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка relay outbox: {str(e)}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -8,9 +8,10 @@ class ResponseStats(BaseModel):
 
 class PaginatedResponseModel(BaseModel):
     data: List[dict]  # Изменил с FullReviewInfo на dict для большей гибкости
-    total: int
+    total: Optional[int] = None  # Считается только по запросу (include_total) или на первой странице
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
     status_counts: Optional[Dict[str, int]] = None
     response_stats: Optional[ResponseStats] = None
 